@@ -0,0 +1,16 @@
+-- GENERATOR: ML_PERFORMANCE
+-- Online feature store: one packed float32 feature vector per profile
+-- HOW TO RUN: npx prisma migrate deploy
+
+-- CreateTable
+CREATE TABLE "profile_feature_vector" (
+    "profile_id" TEXT NOT NULL,
+    "schema_version" INTEGER NOT NULL,
+    "vector" BYTEA NOT NULL,
+    "updated_at" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "profile_feature_vector_pkey" PRIMARY KEY ("profile_id")
+);
+
+-- AddForeignKey
+ALTER TABLE "profile_feature_vector" ADD CONSTRAINT "profile_feature_vector_profile_id_fkey" FOREIGN KEY ("profile_id") REFERENCES "customer_profile"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,11 @@
+-- GENERATOR: ML_PERFORMANCE
+-- Purchase probabilities for product_intent, written by the intent rescoring job
+-- HOW TO RUN: npx prisma migrate deploy
+
+-- AlterTable
+ALTER TABLE "product_intent" ADD COLUMN "purchase_probability" DOUBLE PRECISION,
+ADD COLUMN "scored_at" TIMESTAMP(3),
+ADD COLUMN "model_version" TEXT;
+
+-- CreateIndex
+CREATE INDEX "product_intent_brand_id_status_purchase_probability_idx" ON "product_intent"("brand_id", "status", "purchase_probability" DESC);
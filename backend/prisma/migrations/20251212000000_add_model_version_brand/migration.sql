@@ -0,0 +1,9 @@
+-- GENERATOR: ML_PERFORMANCE
+-- Brand-specific model versions (brand_id NULL = shared model)
+-- HOW TO RUN: npx prisma migrate deploy
+
+-- AlterTable
+ALTER TABLE "model_version" ADD COLUMN "brand_id" TEXT;
+
+-- CreateIndex
+CREATE INDEX "model_version_brand_id_model_type_is_active_idx" ON "model_version"("brand_id", "model_type", "is_active");
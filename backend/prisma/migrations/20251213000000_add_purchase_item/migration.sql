@@ -0,0 +1,111 @@
+-- GENERATOR: ML_PERFORMANCE
+-- purchase_item: one row per product of a purchase event, kept in sync with
+-- customer_raw_event by a trigger, so purchase histories are read from a
+-- narrow indexed table instead of walking every event payload
+-- HOW TO RUN: npx prisma migrate deploy
+
+-- Product IDs of one purchase payload, in payload order. Same rules as the
+-- ML service's api/purchase_items.py purchased_product_ids():
+--   items[] / line_items[] / products[] objects: product_id, else id, else sku
+--   products[] strings: the string itself
+--   none of the above: the top-level product_id
+-- Payloads stored as a JSON string are decoded; undecodable ones yield nothing.
+CREATE OR REPLACE FUNCTION purchase_payload_products(payload JSONB)
+RETURNS TABLE (item_index INTEGER, product_id TEXT)
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    doc JSONB := payload;
+BEGIN
+    IF jsonb_typeof(doc) = 'string' THEN
+        BEGIN
+            doc := (doc #>> '{}')::JSONB;
+        EXCEPTION WHEN others THEN
+            RETURN;
+        END;
+    END IF;
+    IF jsonb_typeof(doc) IS DISTINCT FROM 'object' THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT list.list_order, element.element_order,
+               CASE
+                   WHEN jsonb_typeof(element.value) = 'object' THEN COALESCE(
+                       NULLIF(element.value ->> 'product_id', ''),
+                       NULLIF(element.value ->> 'id', ''),
+                       NULLIF(element.value ->> 'sku', '')
+                   )
+                   WHEN list.key = 'products' AND jsonb_typeof(element.value) = 'string' THEN NULLIF(element.value #>> '{}', '')
+               END AS product_id
+        FROM unnest(ARRAY['items', 'line_items', 'products']) WITH ORDINALITY AS list(key, list_order)
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(doc -> list.key) = 'array' THEN doc -> list.key ELSE '[]'::JSONB END
+        ) WITH ORDINALITY AS element(value, element_order)
+    ),
+    extracted AS (
+        SELECT candidates.list_order, candidates.element_order, candidates.product_id
+        FROM candidates
+        WHERE candidates.product_id IS NOT NULL
+    )
+    SELECT (ROW_NUMBER() OVER (ORDER BY extracted.list_order, extracted.element_order) - 1)::INTEGER, extracted.product_id
+    FROM extracted
+    UNION ALL
+    SELECT 0, doc ->> 'product_id'
+    WHERE NOT EXISTS (SELECT 1 FROM extracted)
+    AND NULLIF(doc ->> 'product_id', '') IS NOT NULL;
+END;
+$$;
+
+-- CreateTable
+CREATE TABLE "purchase_item" (
+    "event_id" TEXT NOT NULL,
+    "item_index" INTEGER NOT NULL,
+    "brand_id" TEXT NOT NULL,
+    "profile_id" TEXT,
+    "product_id" TEXT NOT NULL,
+    "created_at" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "purchase_item_pkey" PRIMARY KEY ("event_id", "item_index")
+);
+
+-- Recent history of one profile: an index-only scan (brand filter and
+-- product_id come from the INCLUDE columns)
+CREATE INDEX "purchase_item_profile_id_created_at_event_id_idx" ON "purchase_item"("profile_id", "created_at" DESC, "event_id")
+INCLUDE ("brand_id", "product_id");
+
+-- item2vec training: every sequence of a brand in profile/time order
+CREATE INDEX "purchase_item_brand_id_profile_id_created_at_idx" ON "purchase_item"("brand_id", "profile_id", "created_at", "event_id", "item_index")
+INCLUDE ("product_id");
+
+-- AddForeignKey
+ALTER TABLE "purchase_item" ADD CONSTRAINT "purchase_item_event_id_fkey" FOREIGN KEY ("event_id") REFERENCES "customer_raw_event"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- Keep purchase_item in sync: re-project an event whenever a column it is
+-- built from changes (e.g. customer_profile_id set when profiles are merged).
+-- Deleted events are removed by the foreign key.
+CREATE OR REPLACE FUNCTION purchase_item_sync() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        DELETE FROM purchase_item WHERE event_id = OLD.id;
+    END IF;
+    IF NEW.event_type = 'purchase' THEN
+        INSERT INTO purchase_item (event_id, item_index, brand_id, profile_id, product_id, created_at)
+        SELECT NEW.id, item.item_index, NEW.brand_id, NEW.customer_profile_id, item.product_id, NEW.created_at
+        FROM purchase_payload_products(NEW.payload) AS item;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER customer_raw_event_purchase_item
+AFTER INSERT OR UPDATE OF payload, event_type, customer_profile_id, brand_id, created_at ON customer_raw_event
+FOR EACH ROW EXECUTE FUNCTION purchase_item_sync();
+
+-- Backfill existing purchase events
+INSERT INTO purchase_item (event_id, item_index, brand_id, profile_id, product_id, created_at)
+SELECT event.id, item.item_index, event.brand_id, event.customer_profile_id, item.product_id, event.created_at
+FROM customer_raw_event AS event
+CROSS JOIN LATERAL purchase_payload_products(event.payload) AS item
+WHERE event.event_type = 'purchase';
@@ -0,0 +1,58 @@
+# GENERATOR: ML_PERFORMANCE
+# ASSUMPTIONS: Airflow installed, DATABASE_URL in env, models trained by train_models_nightly
+# HOW TO RUN: Place in Airflow dags folder, trigger via Airflow UI or CLI
+#             (conf: {"brand_id": "...", "chunk_size": 5000, "workers": 4})
+
+from datetime import datetime, timedelta
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+import os
+import sys
+
+# Add ML service to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../services/ml_service'))
+
+from train.bulk_score import run_bulk_scoring, DEFAULT_CHUNK_SIZE
+from dotenv import load_dotenv
+
+load_dotenv()
+
+default_args = {
+    'owner': 'constintel',
+    'depends_on_past': False,
+    'email_on_failure': False,
+    'email_on_retry': False,
+    'retries': 1,
+    'retry_delay': timedelta(minutes=5),
+}
+
+dag = DAG(
+    'bulk_score_nightly',
+    default_args=default_args,
+    description='Precompute churn/LTV/segment/recommendations for every profile',
+    schedule_interval='0 4 * * *',  # Daily at 4 AM (after model training)
+    start_date=datetime(2024, 1, 1),
+    catchup=False,
+    tags=['ml', 'scoring'],
+)
+
+def bulk_score_task(**context):
+    """Score all profiles into the predictions table"""
+    dag_run = context.get('dag_run')
+    conf = (dag_run.conf if dag_run else None) or {}
+
+    summary = run_bulk_scoring(
+        brand_id=conf.get('brand_id'),
+        chunk_size=int(conf.get('chunk_size', DEFAULT_CHUNK_SIZE)),
+        workers=conf.get('workers'),
+    )
+    print(f"Bulk scoring complete: {summary}")
+    return summary
+
+bulk_score = PythonOperator(
+    task_id='bulk_score',
+    python_callable=bulk_score_task,
+    dag=dag,
+)
+
+bulk_score
@@ -0,0 +1,61 @@
+# GENERATOR: ML_PERFORMANCE
+# ASSUMPTIONS: Airflow installed, DATABASE_URL in env, active intent model in model_version
+# HOW TO RUN: Place in Airflow dags folder, trigger via Airflow UI or CLI
+#             (conf: {"brand_id": "...", "full": true})
+
+from datetime import datetime, timedelta
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+import os
+import sys
+
+# Add ML service to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../services/ml_service'))
+
+from train.score_intents import run_intent_scoring
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Hour (UTC) of the daily full rescore; hours_since_last_view and
+# days_since_first_view drift for intents that are not touched again
+FULL_RESCORE_HOUR = 2
+
+default_args = {
+    'owner': 'constintel',
+    'depends_on_past': False,
+    'email_on_failure': False,
+    'email_on_retry': False,
+    'retries': 1,
+    'retry_delay': timedelta(minutes=5),
+}
+
+dag = DAG(
+    'score_intents_hourly',
+    default_args=default_args,
+    description='Rescore purchase probability of active product intents',
+    schedule_interval='15 * * * *',  # Hourly; incremental except the daily full run
+    start_date=datetime(2024, 1, 1),
+    catchup=False,
+    max_active_runs=1,
+    tags=['ml', 'scoring', 'intent'],
+)
+
+def score_intents_task(**context):
+    """Rescore active intents (incremental, or full once a day)"""
+    dag_run = context.get('dag_run')
+    conf = (dag_run.conf if dag_run else None) or {}
+    logical_date = context.get('logical_date')
+    full = conf.get('full', logical_date is not None and logical_date.hour == FULL_RESCORE_HOUR)
+
+    summary = run_intent_scoring(brand_id=conf.get('brand_id'), incremental=not full)
+    print(f"Intent scoring complete: {summary}")
+    return summary
+
+score_intents = PythonOperator(
+    task_id='score_intents',
+    python_callable=score_intents_task,
+    dag=dag,
+)
+
+score_intents
@@ -37,7 +37,7 @@ dag = DAG(
 )
 
 def train_models_task(**context):
-    """Train all ML models"""
+    """Train all ML models (shared, or a brand's own when conf has brand_id)"""
     brand_id = context.get('dag_run').conf.get('brand_id') if context.get('dag_run') else None
     
     print("Loading training data...")
@@ -49,15 +49,15 @@ def train_models_task(**context):
         return
     
     print("Training segmentation model...")
-    seg_result = train_segmentation_model(df)
+    seg_result = train_segmentation_model(df, brand_id)
     print(f"Segmentation model saved: {seg_result['model_file']}")
     
     print("Training churn model...")
-    churn_result = train_churn_model(df)
+    churn_result = train_churn_model(df, brand_id)
     print(f"Churn model saved: {churn_result['model_file']}")
     
     print("Training LTV model...")
-    ltv_result = train_ltv_model(df)
+    ltv_result = train_ltv_model(df, brand_id)
     print(f"LTV model saved: {ltv_result['model_file']}")
     
     print("Training complete!")
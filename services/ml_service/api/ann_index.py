@@ -0,0 +1,276 @@
+# GENERATOR: ML_PERFORMANCE
+# FAISS index types for the recommendation engine and their recall/latency trade-off
+# HOW TO USE: index = build_index(vectors, 'ivf_flat')            # vectors L2-normalized
+#             report = recall_report(index, vectors, k=10)        # recall@k vs. flat, per nprobe/efSearch
+#             chosen = tune_search_params(index, report, target_recall=0.95)
+#             (train_recommendations.py --index-type ... --compare-indexes does all of this)
+# Index types (inner product on normalized vectors = cosine similarity):
+#   flat      exact brute-force scan; search time linear in catalog size
+#   ivf_flat  k-means coarse quantizer, scans `nprobe` of `nlist` lists; full vectors
+#   ivf_pq    as ivf_flat with product-quantized codes (pq_m bytes per vector)
+#   hnsw      graph search; `efSearch` candidates per query, no training
+# nprobe/efSearch are stored inside the index file, so the value chosen at
+# build time is what the service searches with; ML_FAISS_NPROBE and
+# ML_FAISS_EF_SEARCH override it at load time.
+
+import math
+import os
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw')
+
+# Serving overrides for the search parameters stored in the index (empty = keep)
+ML_FAISS_NPROBE = os.getenv("ML_FAISS_NPROBE", "")
+ML_FAISS_EF_SEARCH = os.getenv("ML_FAISS_EF_SEARCH", "")
+
+# k-means needs ~39 training points per centroid to converge (faiss warns below)
+MIN_POINTS_PER_CENTROID = 39
+# Training-set sample per IVF list; the whole catalog is used if smaller
+TRAIN_POINTS_PER_LIST = 64
+
+NPROBE_SWEEP = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256, 512)
+
+
+def default_nlist(num_vectors: int) -> int:
+    """~4*sqrt(n) lists (a power of two), with enough vectors per list to train"""
+    nlist = 2 ** int(round(math.log2(max(1.0, 4 * math.sqrt(num_vectors)))))
+    return max(1, min(nlist, num_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def default_pq_m(dimension: int) -> int:
+    """Sub-quantizers for IVF-PQ: ~4 dimensions each, and a divisor of the dimension"""
+    for m in range(max(1, dimension // 4), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def training_sample(vectors: np.ndarray, size: int, seed: int = 0) -> np.ndarray:
+    """Uniform sample of `size` rows (all rows if there are fewer)"""
+    if len(vectors) <= size:
+        return vectors
+    rows = np.random.default_rng(seed).choice(len(vectors), size=size, replace=False)
+    return np.ascontiguousarray(vectors[np.sort(rows)])
+
+
+def build_index(
+    vectors: np.ndarray,
+    index_type: str = 'flat',
+    nlist: Optional[int] = None,
+    pq_m: Optional[int] = None,
+    pq_bits: int = 8,
+    hnsw_m: int = 32,
+    ef_construction: int = 200,
+    seed: int = 0,
+) -> Any:
+    """
+    Build and fill an inner-product index over L2-normalized float32 vectors
+
+    IVF indexes are trained on a sample of TRAIN_POINTS_PER_LIST vectors per
+    list. Catalogs too small to train the requested index get a flat index.
+    """
+    import faiss
+
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    num_vectors, dimension = vectors.shape
+
+    if index_type in ('ivf_flat', 'ivf_pq'):
+        nlist = nlist or default_nlist(num_vectors)
+        if nlist < 2 or num_vectors < nlist * MIN_POINTS_PER_CENTROID:
+            print(f"⚠️  Warning: {num_vectors} vectors are too few for {index_type} (nlist={nlist}), using flat")
+            index_type = 'flat'
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatIP(dimension)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        quantizer = faiss.IndexFlatIP(dimension)
+        if index_type == 'ivf_flat':
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            sample_size = nlist * TRAIN_POINTS_PER_LIST
+        else:
+            pq_m = pq_m or default_pq_m(dimension)
+            if dimension % pq_m:
+                raise ValueError(f"pq_m={pq_m} must divide the vector dimension {dimension}")
+            # Each sub-quantizer is a k-means with 2**pq_bits centroids
+            pq_bits = min(pq_bits, int(math.log2(num_vectors / MIN_POINTS_PER_CENTROID)))
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_bits, faiss.METRIC_INNER_PRODUCT)
+            sample_size = max(nlist, 2 ** pq_bits) * TRAIN_POINTS_PER_LIST
+        index.cp.seed = seed
+        index.train(training_sample(vectors, sample_size, seed))
+
+    index.add(vectors)
+    return index
+
+
+def index_type_of(index: Any) -> str:
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(index, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(index, faiss.IndexIVF):
+        return 'ivf_flat'
+    return 'flat'
+
+
+def search_params(index: Any) -> Dict[str, Any]:
+    """Index type, size and current search parameters"""
+    import faiss
+
+    params: Dict[str, Any] = {'index_type': index_type_of(index), 'ntotal': int(index.ntotal)}
+    if isinstance(index, faiss.IndexHNSW):
+        params.update({'m': index.hnsw.nb_neighbors(1), 'ef_search': index.hnsw.efSearch})
+    elif isinstance(index, faiss.IndexIVF):
+        params.update({'nlist': index.nlist, 'nprobe': index.nprobe})
+        if isinstance(index, faiss.IndexIVFPQ):
+            params.update({'pq_m': index.pq.M, 'pq_bits': index.pq.nbits})
+    return params
+
+
+def set_search_params(index: Any, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    """Set nprobe (IVF) / efSearch (HNSW); parameters of other index types are ignored"""
+    import faiss
+
+    if nprobe and isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(nprobe, index.nlist)
+    if ef_search and isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+
+def apply_serving_overrides(index: Any) -> None:
+    """Apply ML_FAISS_NPROBE / ML_FAISS_EF_SEARCH to an index loaded for serving"""
+    set_search_params(
+        index,
+        nprobe=int(ML_FAISS_NPROBE) if ML_FAISS_NPROBE else None,
+        ef_search=int(ML_FAISS_EF_SEARCH) if ML_FAISS_EF_SEARCH else None,
+    )
+
+
+def index_bytes(index: Any) -> int:
+    import faiss
+
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def sample_queries(vectors: np.ndarray, count: int = 1000, max_items: int = 5, seed: int = 1) -> np.ndarray:
+    """
+    Queries shaped like the service's: normalized mean of 1..max_items catalog vectors
+
+    get_recommendations searches with the mean embedding of a customer's
+    purchases, which rarely coincides with a catalog vector.
+    """
+    import faiss
+
+    rng = np.random.default_rng(seed)
+    queries = np.empty((count, vectors.shape[1]), dtype='float32')
+    for i in range(count):
+        rows = rng.choice(len(vectors), size=min(len(vectors), int(rng.integers(1, max_items + 1))), replace=False)
+        queries[i] = vectors[rows].mean(axis=0)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    import faiss
+
+    flat = faiss.IndexFlatIP(vectors.shape[1])
+    flat.add(np.ascontiguousarray(vectors, dtype='float32'))
+    return flat.search(queries, k)[1]
+
+
+def measure(index: Any, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, float]:
+    """recall@k against `truth`, single-query latency (as served) and batch throughput"""
+    latencies: List[float] = []
+    found = np.empty((len(queries), k), dtype='int64')
+    for i in range(len(queries)):
+        t0 = time.perf_counter()
+        found[i] = index.search(queries[i:i + 1], k)[1][0]
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    index.search(queries, k)
+    batch_seconds = time.perf_counter() - t0
+
+    hits = sum(len(set(found[i]) & set(truth[i])) for i in range(len(queries)))
+    latencies.sort()
+    return {
+        'recall_at_k': round(hits / float(truth.size), 4),
+        'p50_ms': round(statistics.median(latencies), 4),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 4),
+        'batch_qps': round(len(queries) / batch_seconds, 1) if batch_seconds else None,
+    }
+
+
+def recall_report(
+    index: Any,
+    vectors: np.ndarray,
+    k: int = 10,
+    queries: Optional[np.ndarray] = None,
+    sweep: Optional[Sequence[int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    recall@k and latency of `index` against exact search, one row per nprobe/efSearch value
+
+    The index's search parameters are restored afterwards.
+    """
+    import faiss
+
+    queries = sample_queries(vectors) if queries is None else queries
+    k = min(k, len(vectors))
+    truth = exact_neighbours(vectors, queries, k)
+    params = search_params(index)
+
+    if isinstance(index, faiss.IndexIVF):
+        param, values = 'nprobe', [v for v in (sweep or NPROBE_SWEEP) if v <= index.nlist]
+    elif isinstance(index, faiss.IndexHNSW):
+        param, values = 'ef_search', list(sweep or EF_SEARCH_SWEEP)
+    else:
+        param, values = None, [None]
+
+    rows = []
+    for value in values:
+        if param:
+            set_search_params(index, **{param: value})
+        rows.append({
+            'index_type': params['index_type'],
+            'param': param,
+            'value': value,
+            'k': k,
+            **measure(index, queries, truth, k),
+        })
+    set_search_params(index, nprobe=params.get('nprobe'), ef_search=params.get('ef_search'))
+    return rows
+
+
+def tune_search_params(index: Any, report: List[Dict[str, Any]], target_recall: float = 0.95) -> Dict[str, Any]:
+    """
+    Set the fastest search parameter whose recall reaches target_recall
+
+    Falls back to the highest-recall row. Returns the chosen report row.
+    """
+    reaching = [row for row in report if row['recall_at_k'] >= target_recall]
+    chosen = min(reaching, key=lambda row: row['p50_ms']) if reaching else max(report, key=lambda row: row['recall_at_k'])
+    if chosen['param']:
+        set_search_params(index, **{chosen['param']: chosen['value']})
+    return chosen
+
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'index':<10} {'param':<10} {'value':>6} {'recall@k':>9} {'p50 ms':>9} {'p99 ms':>9} {'batch q/s':>11}"]
+    for row in rows:
+        lines.append(
+            f"{row['index_type']:<10} {row['param'] or '-':<10} {row['value'] if row['value'] is not None else '-':>6} "
+            f"{row['recall_at_k']:>9.4f} {row['p50_ms']:>9.4f} {row['p99_ms']:>9.4f} {row['batch_qps'] or 0:>11.1f}"
+        )
+    return "\n".join(lines)
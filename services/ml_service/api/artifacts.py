@@ -0,0 +1,410 @@
+# GENERATOR: ML_PERFORMANCE
+# Checksummed model artifacts: a manifest plus native model files
+# HOW TO USE: manifest_path = save_artifact(os.path.join(MODEL_PATH, f"churn_{version}"), 'churn', bundle)
+#             bundle = load_artifact_bundle(manifest_path)   # same keys as the pickled bundles
+#             python -m api.artifacts convert models/churn_<version>.pkl   (existing pickles)
+#             python -m api.artifacts verify models/churn_<version>/manifest.json
+# An artifact is a directory <model_type>_<version>/ holding:
+#   manifest.json                  format, model type, version, brand, feature columns and
+#                                  schema version, training metadata, sha256 of every file
+#   model.txt                      LightGBM model (churn, ltv, intent)
+#   centroids.npy, scaler_*.npy    KMeans centroids and StandardScaler arrays (segmentation)
+#   index.faiss, products.json,    FAISS index, product ids in index order, item2vec vectors
+#   vectors.npy, popularity.npy    in the same order and product rows by purchase count
+#                                  (recommendations; no gensim needed to serve them)
+# manifest.json is written last, so a directory without one is incomplete
+# and never loaded. Loading verifies the checksums (ML_VERIFY_ARTIFACTS)
+# and memory-maps the .npy arrays.
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from api.feature_store import FEATURE_SCHEMA_VERSION
+
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+ML_VERIFY_ARTIFACTS = os.getenv("ML_VERIFY_ARTIFACTS", "true").lower() == "true"
+# "manifest" (this format) or "pickle" for artifacts written by the training scripts
+ML_ARTIFACT_FORMAT = os.getenv("ML_ARTIFACT_FORMAT", "manifest").lower()
+# dtype of exported item2vec vectors; float16 halves their size (the mean
+# embedding is still computed in float32)
+ML_EMBEDDING_DTYPE = os.getenv("ML_EMBEDDING_DTYPE", "float32").lower()
+
+BOOSTER_MODEL_TYPES = ('churn', 'ltv', 'intent')
+
+
+class ArtifactError(Exception):
+    """Raised when an artifact is incomplete, corrupt or cannot be written natively"""
+
+
+class CentroidModel:
+    """Nearest-centroid assignment; predicts like the fitted KMeans it came from"""
+
+    def __init__(self, centroids: np.ndarray):
+        self.cluster_centers_ = centroids
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        distances = ((X[:, None, :] - self.cluster_centers_[None, :, :]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1)
+
+
+class ScalerArrays:
+    """StandardScaler.transform from its mean_/scale_ arrays"""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class BoosterClassifier:
+    """predict/predict_proba of a binary LGBMClassifier over its saved Booster"""
+
+    def __init__(self, booster: Any):
+        self.booster_ = booster
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        positive = self.booster_.predict(X)
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return (self.booster_.predict(X) > 0.5).astype(int)
+
+
+class ItemEmbeddings:
+    """
+    item2vec vectors for serving: the part of Word2Vec.wv recommendations use
+
+    Rows of `vectors` follow `index_to_key` (the FAISS index order);
+    `popularity` lists row numbers by purchase count, most bought first.
+    """
+
+    def __init__(self, index_to_key: List[str], vectors: np.ndarray, popularity: np.ndarray):
+        self.index_to_key = index_to_key
+        self.key_to_index = {key: idx for idx, key in enumerate(index_to_key)}
+        self.vectors = vectors
+        self.popularity = popularity
+
+    @classmethod
+    def from_keyed_vectors(cls, wv: Any, dtype: str = 'float32') -> 'ItemEmbeddings':
+        """From a gensim KeyedVectors (Word2Vec.wv)"""
+        keys = list(wv.index_to_key)
+        counts = np.array([wv.get_vecattr(key, 'count') for key in keys], dtype=np.int64)
+        return cls(
+            keys,
+            np.ascontiguousarray(wv.vectors, dtype=dtype),
+            np.argsort(-counts, kind='stable').astype(np.int32),
+        )
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.key_to_index
+
+    def __len__(self) -> int:
+        return len(self.index_to_key)
+
+    def mean_vector(self, keys: List[str]) -> Optional[np.ndarray]:
+        """float32 mean embedding of the known keys, shape (1, dim); None if none is known"""
+        rows = [self.key_to_index[key] for key in keys if key in self.key_to_index]
+        if not rows:
+            return None
+        return self.vectors[rows].astype(np.float32).mean(axis=0, keepdims=True)
+
+    def mean_vectors(self, key_lists: List[List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        float32 mean embeddings of many key lists, shape (n, dim), with one gather
+
+        Also returns a bool mask of the lists with at least one known key;
+        the other rows are zero.
+        """
+        rows: List[int] = []
+        counts = np.zeros(len(key_lists), dtype=np.int64)
+        for i, keys in enumerate(key_lists):
+            known = [self.key_to_index[key] for key in keys if key in self.key_to_index]
+            rows.extend(known)
+            counts[i] = len(known)
+
+        known_mask = counts > 0
+        means = np.zeros((len(key_lists), self.vectors.shape[1]), dtype=np.float32)
+        if rows:
+            gathered = self.vectors[np.asarray(rows)].astype(np.float32)
+            starts = (np.cumsum(counts) - counts)[known_mask]
+            means[known_mask] = np.add.reduceat(gathered, starts, axis=0) / counts[known_mask, None]
+        return means, known_mask
+
+    def popular(self, top_k: int) -> List[str]:
+        return [self.index_to_key[row] for row in self.popularity[:top_k]]
+
+    def save(self, vectors_path: str, popularity_path: str) -> None:
+        np.save(vectors_path, self.vectors)
+        np.save(popularity_path, np.asarray(self.popularity, dtype=np.int32))
+
+    @classmethod
+    def load(cls, index_to_key: List[str], vectors_path: str, popularity_path: str, mmap: bool = True) -> 'ItemEmbeddings':
+        mmap_mode = 'r' if mmap else None
+        vectors = np.load(vectors_path, mmap_mode=mmap_mode)
+        if len(vectors) != len(index_to_key):
+            raise ArtifactError(f"{vectors_path} has {len(vectors)} rows for {len(index_to_key)} products")
+        return cls(index_to_key, vectors, np.load(popularity_path, mmap_mode=mmap_mode))
+
+
+def is_manifest(path: Optional[str]) -> bool:
+    return bool(path) and os.path.basename(path) == MANIFEST_NAME
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_size(path: str) -> int:
+    """Bytes on disk of a pickle or of every file listed in a manifest"""
+    if not is_manifest(path):
+        return os.path.getsize(path)
+    return sum(entry['bytes'] for entry in read_manifest(path)['files'].values())
+
+
+def read_manifest(manifest_path: str) -> Dict[str, Any]:
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != ARTIFACT_FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format {manifest.get('format')!r} in {manifest_path}")
+    return manifest
+
+
+def verify_artifact(manifest_path: str, manifest: Optional[Dict[str, Any]] = None) -> None:
+    """Raise ArtifactError unless every file matches its size and sha256"""
+    manifest = manifest or read_manifest(manifest_path)
+    directory = os.path.dirname(manifest_path)
+    for name, entry in manifest['files'].items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path) or os.path.getsize(path) != entry['bytes']:
+            raise ArtifactError(f"{path} is missing or has the wrong size")
+        if file_sha256(path) != entry['sha256']:
+            raise ArtifactError(f"Checksum mismatch for {path}")
+
+
+def _write_manifest(directory: str, manifest: Dict[str, Any], file_names: List[str]) -> str:
+    manifest['files'] = {
+        name: {
+            'sha256': file_sha256(os.path.join(directory, name)),
+            'bytes': os.path.getsize(os.path.join(directory, name)),
+        }
+        for name in sorted(file_names)
+    }
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def _base_manifest(model_type: str, version: str, brand_id: Optional[str], training: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        'format': ARTIFACT_FORMAT_VERSION,
+        'model_type': model_type,
+        'version': version,
+        'brand_id': brand_id,
+        'created_at': datetime.utcnow().isoformat(),
+        'feature_schema_version': FEATURE_SCHEMA_VERSION,
+        'training': training or {},
+    }
+
+
+def save_artifact(
+    directory: str,
+    model_type: str,
+    bundle: Dict[str, Any],
+    training: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Write a churn/ltv/segmentation/intent bundle as a manifest artifact
+
+    bundle is what the training scripts pickle ({model, feature_cols,
+    version, ...}; for intent at least {model, version}). Returns the
+    manifest path. Raises ArtifactError for models without a native format.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = _base_manifest(model_type, bundle['version'], bundle.get('brand_id'), training)
+    manifest['feature_cols'] = list(bundle.get('feature_cols') or [])
+    model = bundle['model']
+
+    if model_type in BOOSTER_MODEL_TYPES:
+        booster = getattr(model, 'booster_', model)
+        if not hasattr(booster, 'save_model') or not hasattr(booster, 'dump_model'):
+            raise ArtifactError(f"{type(model).__name__} has no native LightGBM format")
+        booster.save_model(os.path.join(directory, 'model.txt'))
+        files = ['model.txt']
+    elif model_type == 'segmentation':
+        scaler = bundle['scaler']
+        np.save(os.path.join(directory, 'centroids.npy'), np.ascontiguousarray(model.cluster_centers_, dtype=np.float64))
+        np.save(os.path.join(directory, 'scaler_mean.npy'), np.asarray(scaler.mean_, dtype=np.float64))
+        np.save(os.path.join(directory, 'scaler_scale.npy'), np.asarray(scaler.scale_, dtype=np.float64))
+        files = ['centroids.npy', 'scaler_mean.npy', 'scaler_scale.npy']
+    else:
+        raise ArtifactError(f"No artifact layout for model type {model_type!r}")
+
+    return _write_manifest(directory, manifest, files)
+
+
+def save_recommendation_artifact(
+    directory: str,
+    version: str,
+    embeddings: ItemEmbeddings,
+    faiss_index: Any,
+    vector_size: int,
+    training: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Write the FAISS index, product order, vectors and popularity as a manifest artifact
+
+    embeddings: ItemEmbeddings.from_keyed_vectors(item2vec_model.wv); the
+    gensim model itself (training state included) is not part of it.
+    """
+    import faiss
+
+    os.makedirs(directory, exist_ok=True)
+    faiss.write_index(faiss_index, os.path.join(directory, 'index.faiss'))
+    with open(os.path.join(directory, 'products.json'), 'w') as f:
+        json.dump(embeddings.index_to_key, f)
+    embeddings.save(os.path.join(directory, 'vectors.npy'), os.path.join(directory, 'popularity.npy'))
+
+    manifest = _base_manifest('recommendations', version, None, training)
+    manifest['vector_size'] = vector_size
+    manifest['vector_dtype'] = str(embeddings.vectors.dtype)
+    manifest['num_products'] = len(embeddings)
+    return _write_manifest(directory, manifest, ['index.faiss', 'products.json', 'vectors.npy', 'popularity.npy'])
+
+
+def load_artifact_bundle(manifest_path: str, verify: Optional[bool] = None, mmap: bool = True) -> Dict[str, Any]:
+    """
+    Load a manifest artifact into the bundle shape the serving code uses
+
+    churn/ltv: {model: Booster, feature_cols, version, brand_id}
+    segmentation: {model: CentroidModel, scaler: ScalerArrays, feature_cols, version, brand_id}
+    intent: {model: BoosterClassifier, version}
+    recommendations: {embeddings: ItemEmbeddings, faiss_index, product_to_idx, vector_size, version, num_products}
+    Every bundle also carries its 'manifest'.
+    """
+    manifest = read_manifest(manifest_path)
+    if ML_VERIFY_ARTIFACTS if verify is None else verify:
+        verify_artifact(manifest_path, manifest)
+    directory = os.path.dirname(manifest_path)
+    path = lambda name: os.path.join(directory, name)
+    mmap_mode = 'r' if mmap else None
+    model_type = manifest['model_type']
+
+    bundle: Dict[str, Any] = {
+        'version': manifest['version'],
+        'brand_id': manifest.get('brand_id'),
+        'feature_cols': manifest.get('feature_cols', []),
+        'manifest': manifest,
+    }
+    if model_type in BOOSTER_MODEL_TYPES:
+        import lightgbm as lgb
+        # model_str rather than model_file: the file loader also re-parses the
+        # training parameters and rejects ones written by newer LightGBM versions
+        with open(path('model.txt')) as f:
+            booster = lgb.Booster(model_str=f.read())
+        bundle['model'] = BoosterClassifier(booster) if model_type == 'intent' else booster
+    elif model_type == 'segmentation':
+        bundle['model'] = CentroidModel(np.load(path('centroids.npy'), mmap_mode=mmap_mode))
+        bundle['scaler'] = ScalerArrays(
+            np.load(path('scaler_mean.npy'), mmap_mode=mmap_mode),
+            np.load(path('scaler_scale.npy'), mmap_mode=mmap_mode),
+        )
+    elif model_type == 'recommendations':
+        import faiss
+        with open(path('products.json')) as f:
+            products = json.load(f)
+        if 'vectors.npy' in manifest['files']:
+            embeddings = ItemEmbeddings.load(products, path('vectors.npy'), path('popularity.npy'), mmap=mmap)
+        else:
+            # Artifacts written before the vectors were exported carry the gensim model
+            from gensim.models import Word2Vec
+            embeddings = ItemEmbeddings.from_keyed_vectors(Word2Vec.load(path('item2vec.model'), mmap=mmap_mode).wv)
+        bundle.update({
+            'embeddings': embeddings,
+            'faiss_index': faiss.read_index(path('index.faiss'), faiss.IO_FLAG_MMAP if mmap else 0),
+            'product_to_idx': embeddings.key_to_index,
+            'vector_size': manifest['vector_size'],
+            'num_products': manifest['num_products'],
+        })
+    else:
+        raise ArtifactError(f"Unknown model type {model_type!r} in {manifest_path}")
+    return bundle
+
+
+def convert_pickle(pickle_path: str, out_dir: Optional[str] = None) -> str:
+    """
+    Convert a pickled bundle written by the training scripts; returns the manifest path
+
+    The model type is taken from the file name (churn_, ltv_, segmentation_,
+    intent_, recommendations_metadata_). The pickle is left in place.
+    """
+    import pickle
+
+    name = os.path.basename(pickle_path)[:-len('.pkl')]
+    with open(pickle_path, 'rb') as f:
+        data = pickle.load(f)
+
+    if name.startswith('recommendations_metadata_'):
+        import faiss
+        from gensim.models import Word2Vec
+        version = data['version']
+        out_dir = out_dir or os.path.join(os.path.dirname(pickle_path), f"recommendations_{version}")
+        return save_recommendation_artifact(
+            out_dir, version,
+            ItemEmbeddings.from_keyed_vectors(Word2Vec.load(data['item2vec_path']).wv, ML_EMBEDDING_DTYPE),
+            faiss.read_index(data['faiss_path']),
+            data['vector_size'],
+            training={'converted_from': pickle_path, 'ann_index': data.get('ann_index')},
+        )
+
+    model_type = name.split('_', 1)[0]
+    if model_type == 'intent':
+        # Bare LGBMClassifier; the version is the file name's timestamp
+        data = {'model': data, 'version': name.split('_', 1)[1]}
+    out_dir = out_dir or os.path.join(os.path.dirname(pickle_path), name)
+    return save_artifact(out_dir, model_type, data, training={'converted_from': pickle_path})
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Convert or verify model artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Write manifest artifacts next to pickled bundles")
+    convert.add_argument("pickles", nargs="+")
+    verify = sub.add_parser("verify", help="Check every file of manifest artifacts against its checksum")
+    verify.add_argument("manifests", nargs="+")
+    args = parser.parse_args()
+
+    failed = False
+    if args.command == "convert":
+        for pickle_path in args.pickles:
+            try:
+                print(f"✅ {pickle_path} -> {convert_pickle(pickle_path)}")
+            except Exception as e:
+                print(f"⚠️  Could not convert {pickle_path}: {e}")
+                failed = True
+    else:
+        for manifest_path in args.manifests:
+            try:
+                verify_artifact(manifest_path)
+                print(f"✅ {manifest_path}")
+            except (ArtifactError, OSError, ValueError) as e:
+                print(f"⚠️  {manifest_path}: {e}")
+                failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,88 @@
+# GENERATOR: ML_PERFORMANCE
+# Micro-batching request coalescer for model inference
+# HOW TO USE: batcher = MicroBatcher('churn', score_churn)
+#             score = await batcher.submit(feature_row)
+# Per-model config: ML_BATCH_<MODEL>_WAIT_US, ML_BATCH_<MODEL>_MAX_ROWS
+
+import asyncio
+import os
+import time
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from api.executors import run_inference
+from api.metrics import BATCH_QUEUE_WAIT, BATCH_SIZE
+
+ML_MICROBATCH_ENABLED = os.getenv("ML_MICROBATCH_ENABLED", "true").lower() == "true"
+DEFAULT_MAX_WAIT_US = int(os.getenv("ML_BATCH_WAIT_US", "2000"))
+DEFAULT_MAX_ROWS = int(os.getenv("ML_BATCH_MAX_ROWS", "64"))
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into one vectorized call.
+
+    Rows submitted within max_wait_us of the first pending row (or until
+    max_batch_size rows are queued) are stacked into one matrix, scored by a
+    single predict_fn call on the inference pool, and the per-row outputs are
+    handed back to each waiting caller. Must be used from one event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        predict_fn: Callable[[np.ndarray], Sequence[Any]],
+        max_wait_us: Optional[int] = None,
+        max_batch_size: Optional[int] = None,
+    ):
+        prefix = f"ML_BATCH_{name.upper()}"
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_wait = int(os.getenv(f"{prefix}_WAIT_US", max_wait_us or DEFAULT_MAX_WAIT_US)) / 1_000_000
+        self.max_batch_size = int(os.getenv(f"{prefix}_MAX_ROWS", max_batch_size or DEFAULT_MAX_ROWS))
+        self._pending: List[Tuple[np.ndarray, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, row: np.ndarray) -> Any:
+        """Queue one feature row and wait for its prediction"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[np.ndarray, asyncio.Future, float]]) -> None:
+        started = time.perf_counter()
+        wait_metric = BATCH_QUEUE_WAIT.labels(model=self.name)
+        for _, _, enqueued in batch:
+            wait_metric.observe(started - enqueued)
+        BATCH_SIZE.labels(model=self.name).observe(len(batch))
+
+        try:
+            X = np.vstack([row for row, _, _ in batch])
+            outputs = await run_inference(self.predict_fn, X)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), output in zip(batch, outputs):
+            # Caller may have gone away (request cancelled)
+            if not future.done():
+                future.set_result(output)
@@ -0,0 +1,163 @@
+# GENERATOR: ML_PERFORMANCE
+# Per-brand churn/LTV/segmentation models, resident under a memory budget
+# HOW TO USE: model_data = brand_models.get(brand_id, 'churn') or global_model
+#             (api.model_loader.get_model_data(model_type, brand_id) does this)
+# Large brands get their own models (train_models.py --brand-id); everyone
+# else is served by the shared model. Which brands have a dedicated model
+# comes from the active model_version rows with a brand_id, refreshed by the
+# model watcher. Brand models are loaded on first use and kept in an LRU
+# bounded by ML_BRAND_MODEL_BUDGET_MB (artifact size on disk as the memory
+# estimate). An evicted or retrained model is reloaded lazily on next use.
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+ML_BRAND_MODEL_BUDGET_MB = float(os.getenv("ML_BRAND_MODEL_BUDGET_MB", "512"))
+
+# Requests served by the shared model are counted under this brand label,
+# so long-tail brands do not each get their own series
+SHARED_BRAND_LABEL = "_shared"
+
+BRAND_MODEL_EVENTS = Counter(
+    'ml_brand_model_events_total',
+    'Brand model cache events (hit, load, evict, fallback, load_error)',
+    ['brand', 'model', 'event'],
+)
+BRAND_MODELS_RESIDENT = Gauge('ml_brand_models_resident', 'Brand-specific models currently loaded')
+BRAND_MODEL_RESIDENT_BYTES = Gauge(
+    'ml_brand_model_resident_bytes',
+    'Estimated memory of loaded brand-specific models (artifact size on disk)',
+)
+
+BrandKey = Tuple[str, str]  # (brand_id, model_type)
+
+
+class BrandModelCache:
+    """LRU of brand-specific model bundles, bounded by total artifact size"""
+
+    def __init__(
+        self,
+        loader: Callable[[str, str], Dict[str, Any]],
+        budget_bytes: int,
+        sizer: Callable[[str], int] = os.path.getsize,
+    ):
+        # loader(model_type, path) -> warmed-up model bundle; raises on failure
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        # sizer(path) -> bytes on disk of the artifact, the memory estimate
+        self.sizer = sizer
+        # (brand_id, model_type) -> (model_path, version) of the active brand models
+        self._registry: Dict[BrandKey, Tuple[str, str]] = {}
+        # (brand_id, model_type) -> (model_path, size, bundle), least recently used first
+        self._resident: "OrderedDict[BrandKey, Tuple[str, int, Dict[str, Any]]]" = OrderedDict()
+        self._resident_bytes = 0
+        # Artifacts that failed to load; not retried until the registry points elsewhere
+        self._failed: Dict[BrandKey, str] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[BrandKey, threading.Lock] = {}
+
+    def set_registry(self, registry: Dict[BrandKey, Tuple[str, str]]) -> None:
+        """Replace the set of active brand models; retired ones are dropped right away"""
+        with self._lock:
+            self._registry = dict(registry)
+            for key in [key for key in self._resident if key not in self._registry]:
+                self._evict(key)
+            self._update_gauges()
+
+    def has_model(self, brand_id: Optional[str], model_type: str) -> bool:
+        return bool(brand_id) and (brand_id, model_type) in self._registry
+
+    def version(self, brand_id: Optional[str], model_type: str) -> Optional[str]:
+        """Version of the active brand model, without loading it"""
+        if not brand_id:
+            return None
+        entry = self._registry.get((brand_id, model_type))
+        return entry[1] if entry else None
+
+    def get(self, brand_id: Optional[str], model_type: str) -> Optional[Dict[str, Any]]:
+        """
+        The brand's own model bundle, loading it if needed
+
+        Returns None (serve the shared model) if the brand has no active
+        model of this type or its artifact cannot be loaded.
+        """
+        key = (brand_id, model_type)
+        entry = self._registry.get(key) if brand_id else None
+        if entry is None:
+            BRAND_MODEL_EVENTS.labels(SHARED_BRAND_LABEL, model_type, 'fallback').inc()
+            return None
+        path = entry[0]
+
+        model_data = self._lookup(key, path)
+        if model_data is not None:
+            BRAND_MODEL_EVENTS.labels(brand_id, model_type, 'hit').inc()
+            return model_data
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        # One load per brand model; concurrent requests for it wait here
+        with load_lock:
+            model_data = self._lookup(key, path)
+            if model_data is not None:
+                BRAND_MODEL_EVENTS.labels(brand_id, model_type, 'hit').inc()
+                return model_data
+            if self._failed.get(key) == path:
+                BRAND_MODEL_EVENTS.labels(brand_id, model_type, 'fallback').inc()
+                return None
+            try:
+                model_data = self.loader(model_type, path)
+                size = self.sizer(path)
+            except Exception as e:
+                print(f"Error loading {model_type} model for brand {brand_id}: {e}")
+                self._failed[key] = path
+                BRAND_MODEL_EVENTS.labels(brand_id, model_type, 'load_error').inc()
+                return None
+            self._failed.pop(key, None)
+            self._insert(key, path, size, model_data)
+
+        BRAND_MODEL_EVENTS.labels(brand_id, model_type, 'load').inc()
+        print(f"Loaded {model_type} model for brand {brand_id}: {path}")
+        return model_data
+
+    def _lookup(self, key: BrandKey, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            resident = self._resident.get(key)
+            if resident is None or resident[0] != path:
+                # Not loaded, or retrained since: (re)load lazily
+                return None
+            self._resident.move_to_end(key)
+            return resident[2]
+
+    def _insert(self, key: BrandKey, path: str, size: int, model_data: Dict[str, Any]) -> None:
+        with self._lock:
+            if key in self._resident:
+                self._evict(key)
+            self._resident[key] = (path, size, model_data)
+            self._resident_bytes += size
+            # Evict least recently used models until within budget; the
+            # model just loaded stays even if it alone is over budget
+            while self._resident_bytes > self.budget_bytes and len(self._resident) > 1:
+                self._evict(next(iter(self._resident)))
+            self._update_gauges()
+
+    def _evict(self, key: BrandKey) -> None:
+        _, size, _ = self._resident.pop(key)
+        self._resident_bytes -= size
+        BRAND_MODEL_EVENTS.labels(key[0], key[1], 'evict').inc()
+
+    def _update_gauges(self) -> None:
+        BRAND_MODELS_RESIDENT.set(len(self._resident))
+        BRAND_MODEL_RESIDENT_BYTES.set(self._resident_bytes)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'registered': len(self._registry),
+                'resident': len(self._resident),
+                'resident_bytes': self._resident_bytes,
+                'budget_bytes': self.budget_bytes,
+            }
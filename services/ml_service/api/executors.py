@@ -0,0 +1,81 @@
+# GENERATOR: ML_PERFORMANCE
+# Bounded thread pools that keep blocking work off the asyncio event loop
+# HOW TO USE: features = await run_db(get_feature_dict, profile_id)
+#             score = await run_inference(predict_churn, profile_id, features)
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from api.tracing import record as record_span
+
+# Postgres (psycopg2) calls block; size the pool to match the connection pool
+# so threads never queue on a connection they cannot get
+ML_DB_THREADS = int(os.getenv("ML_DB_THREADS", os.getenv("DB_POOL_MAX", "10")))
+# CPU-bound inference (LightGBM, sklearn, FAISS). NumPy/LightGBM release the
+# GIL, so a few threads give real parallelism without oversubscribing cores
+ML_INFERENCE_THREADS = int(os.getenv("ML_INFERENCE_THREADS", str(min(4, os.cpu_count() or 1))))
+
+_db_executor = ThreadPoolExecutor(max_workers=ML_DB_THREADS, thread_name_prefix="ml-db")
+_inference_executor = ThreadPoolExecutor(max_workers=ML_INFERENCE_THREADS, thread_name_prefix="ml-inference")
+
+# Work items currently running on each pool (for saturation metrics)
+_busy = {id(_db_executor): 0, id(_inference_executor): 0}
+_busy_lock = threading.Lock()
+
+
+def _run_tracked(executor: ThreadPoolExecutor, name: str, submitted: float, fn: Callable[..., Any]) -> Any:
+    record_span(f"queue_wait.{name}", time.perf_counter() - submitted)
+    with _busy_lock:
+        _busy[id(executor)] += 1
+    try:
+        return fn()
+    finally:
+        with _busy_lock:
+            _busy[id(executor)] -= 1
+
+
+async def _run_in(executor: ThreadPoolExecutor, name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    # Copy the caller's context so contextvars (request state, trace) follow the work
+    ctx = contextvars.copy_context()
+    call = functools.partial(
+        ctx.run, _run_tracked, executor, name, time.perf_counter(), functools.partial(fn, *args, **kwargs)
+    )
+    return await loop.run_in_executor(executor, call)
+
+
+async def run_db(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking database call on the DB thread pool"""
+    return await _run_in(_db_executor, 'db', fn, *args, **kwargs)
+
+
+async def run_inference(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run CPU-bound model work on the inference thread pool"""
+    return await _run_in(_inference_executor, 'inference', fn, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, int]]:
+    """Configured size, running and queued work items per pool"""
+    return {
+        'db': {
+            'max_workers': ML_DB_THREADS,
+            'busy': _busy[id(_db_executor)],
+            'queued': _db_executor._work_queue.qsize(),
+        },
+        'inference': {
+            'max_workers': ML_INFERENCE_THREADS,
+            'busy': _busy[id(_inference_executor)],
+            'queued': _inference_executor._work_queue.qsize(),
+        },
+    }
+
+
+def shutdown() -> None:
+    _db_executor.shutdown(wait=False)
+    _inference_executor.shutdown(wait=False)
@@ -0,0 +1,39 @@
+# GENERATOR: ML_PERFORMANCE
+# Per-request feature context: load a profile's features and purchase history once
+# HOW TO USE: ctx = FeatureContext(profile_id, brand_id); predict_from_features(ctx.features)
+
+from typing import Any, Dict, List, Optional
+
+from api.model_loader import get_feature_dict
+
+
+class FeatureContext:
+    """
+    Lazily loads and memoizes everything the models need for one profile.
+
+    A request that runs several models reads the stored features and the
+    purchase history at most once each, however many models consume them.
+    """
+
+    def __init__(self, profile_id: str, brand_id: Optional[str] = None):
+        self.profile_id = profile_id
+        self.brand_id = brand_id
+        self._features: Optional[Dict[str, Any]] = None
+        self._features_loaded = False
+        self._purchase_history: Optional[List[str]] = None
+
+    @property
+    def features(self) -> Optional[Dict[str, Any]]:
+        """Decoded {feature_name: value} dict, or None if the profile has no features"""
+        if not self._features_loaded:
+            self._features = get_feature_dict(self.profile_id)
+            self._features_loaded = True
+        return self._features
+
+    @property
+    def purchase_history(self) -> List[str]:
+        """Product IDs the profile has purchased (empty if unknown)"""
+        if self._purchase_history is None:
+            from api.recommendation_engine import get_customer_item_history
+            self._purchase_history = get_customer_item_history(self.profile_id, self.brand_id)
+        return self._purchase_history
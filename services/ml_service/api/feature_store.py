@@ -0,0 +1,92 @@
+# GENERATOR: ML_PERFORMANCE
+# Online feature store: one packed float32 vector per profile
+# ASSUMPTIONS: profile_feature_vector table (backend/prisma/schema.prisma FeatureVector)
+# HOW TO USE: blob = pack_features(features)            # writer (feature_builder)
+#             features = get_vector_features(profile_id) # reader, single PK lookup
+# Numeric features are stored in FEATURE_SCHEMAS[version] order, with NaN
+# for missing values. Dict-valued features (category_affinity) stay in the
+# EAV `features` table. Add a new schema version rather than reordering one.
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from api.db import db_cursor
+
+FEATURE_SCHEMAS: Dict[int, List[str]] = {
+    1: [
+        'recency',
+        'frequency',
+        'monetary',
+        'online_offline_ratio',
+        'session_counts',
+        'profile_strength',
+    ],
+}
+FEATURE_SCHEMA_VERSION = max(FEATURE_SCHEMAS)
+FEATURE_SCHEMA = FEATURE_SCHEMAS[FEATURE_SCHEMA_VERSION]
+
+_VECTOR_DTYPE = np.dtype('<f4')
+
+
+def split_features(features: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(vector features, side-store features): schema columns vs everything else"""
+    columns = set(FEATURE_SCHEMA)
+    vector = {name: value for name, value in features.items() if name in columns}
+    side = {name: value for name, value in features.items() if name not in columns}
+    return vector, side
+
+
+def pack_features(features: Dict[str, Any]) -> bytes:
+    """Encode the schema columns of a feature dict as little-endian float32"""
+    values = np.full(len(FEATURE_SCHEMA), np.nan, dtype=_VECTOR_DTYPE)
+    for j, name in enumerate(FEATURE_SCHEMA):
+        value = features.get(name)
+        if value is not None:
+            values[j] = float(value)
+    return values.tobytes()
+
+
+def unpack_features(blob: bytes, schema_version: int) -> Optional[Dict[str, float]]:
+    """Decode a stored vector to {feature_name: value}; None for an unknown schema"""
+    columns = FEATURE_SCHEMAS.get(schema_version)
+    if columns is None:
+        return None
+    values = np.frombuffer(blob, dtype=_VECTOR_DTYPE)
+    if len(values) != len(columns):
+        return None
+    return {name: float(value) for name, value in zip(columns, values) if not np.isnan(value)}
+
+
+def get_vector_features(profile_id: str) -> Optional[Dict[str, float]]:
+    """Numeric features for one profile, or None if it has no usable vector"""
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT schema_version, vector
+            FROM profile_feature_vector
+            WHERE profile_id = %s
+        """, [profile_id])
+        row = cursor.fetchone()
+    if not row:
+        return None
+    return unpack_features(bytes(row['vector']), row['schema_version'])
+
+
+def get_vector_features_many(profile_ids: List[str]) -> Dict[str, Dict[str, float]]:
+    """Numeric features for many profiles in one query; profiles without a vector are absent"""
+    if not profile_ids:
+        return {}
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT profile_id, schema_version, vector
+            FROM profile_feature_vector
+            WHERE profile_id = ANY(%s)
+        """, [list(set(profile_ids))])
+        rows = cursor.fetchall()
+
+    features_by_profile = {}
+    for row in rows:
+        features = unpack_features(bytes(row['vector']), row['schema_version'])
+        if features is not None:
+            features_by_profile[row['profile_id']] = features
+    return features_by_profile
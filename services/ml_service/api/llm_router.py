@@ -52,7 +52,7 @@ class ReportRequest(BaseModel):
 
 
 @router.get("/health")
-async def llm_health():
+def llm_health():
     """Check LLM service health"""
     try:
         from api.llm_service import check_ollama_health
@@ -72,7 +72,7 @@ async def llm_health():
 
 
 @router.post("/insights")
-async def generate_insights(request: InsightsRequest):
+def generate_insights(request: InsightsRequest):
     """
     Generate natural language insights from analytics data
     
@@ -115,7 +115,7 @@ async def generate_insights(request: InsightsRequest):
 
 
 @router.post("/ask")
-async def answer_question(request: QueryRequest):
+def answer_question(request: QueryRequest):
     """
     Answer a natural language question about analytics data
     
@@ -163,7 +163,7 @@ async def answer_question(request: QueryRequest):
 
 
 @router.post("/explain-anomaly")
-async def explain_anomaly(request: AnomalyExplanationRequest):
+def explain_anomaly(request: AnomalyExplanationRequest):
     """
     Generate explanation for a data anomaly
     
@@ -201,7 +201,7 @@ async def explain_anomaly(request: AnomalyExplanationRequest):
 
 
 @router.post("/generate-report")
-async def generate_report(request: ReportRequest):
+def generate_report(request: ReportRequest):
     """
     Generate a comprehensive analytics report
     
@@ -10,6 +10,8 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime
 import logging
 
+from api.metrics import timed_stage
+
 logger = logging.getLogger(__name__)
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
@@ -66,11 +68,12 @@ def call_ollama(prompt: str, system_prompt: Optional[str] = None, stream: bool =
         if system_prompt:
             payload["system"] = system_prompt
         
-        response = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json=payload,
-            timeout=OLLAMA_TIMEOUT
-        )
+        with timed_stage('ollama_call'):
+            response = requests.post(
+                f"{OLLAMA_URL}/api/generate",
+                json=payload,
+                timeout=OLLAMA_TIMEOUT
+            )
         
         if response.status_code == 200:
             data = response.json()
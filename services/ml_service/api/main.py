@@ -1,21 +1,25 @@
 # GENERATOR: FULL_PLATFORM
 # ASSUMPTIONS: DATABASE_URL, REDIS_URL in env, models trained and stored in ./models/
 # HOW TO RUN: uvicorn api.main:app --host 0.0.0.0 --port 8000
+#             several workers sharing loaded models: python -m api.prefork --workers 4
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 import os
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import redis
-import json
+import redis.asyncio as aioredis
+import asyncio
+import time
 from datetime import datetime
 
 load_dotenv()
 
+# Import and model load timings, and readiness for /ready
+from api.startup import startup, ML_LAZY_STARTUP
+
 app = FastAPI(title="ConstIntel ML Service", version="1.0.0")
 
 app.add_middleware(
@@ -26,41 +30,82 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database connection (optional - only needed for some features)
-def get_db_connection():
+# Database access goes through the shared connection pool (optional - only needed for some features)
+from api import db
+
+# Blocking DB calls and CPU-bound inference run on bounded thread pools
+from api.executors import run_db, run_inference, executor_stats, shutdown as shutdown_executors
+from api.tracing import ML_TRACE_ENABLED, ML_TRACE_HEADER, span, start_trace, server_timing_header
+from api.metrics import (
+    render_latest, REQUEST_LATENCY, REQUESTS, timed_stage, update_pool_gauges, update_model_info
+)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-route latency histogram and status counter, plus opt-in Server-Timing"""
+    started = time.perf_counter()
+    trace = start_trace() if ML_TRACE_ENABLED and request.headers.get(ML_TRACE_HEADER) else None
+    status = 500
     try:
-        db_url = os.getenv("DATABASE_URL")
-        if not db_url:
-            return None
-        return psycopg2.connect(
-            db_url,
-            cursor_factory=RealDictCursor
-        )
-    except Exception:
-        return None
+        response = await call_next(request)
+        status = response.status_code
+        if trace is not None:
+            response.headers['Server-Timing'] = server_timing_header(trace, time.perf_counter() - started)
+        return response
+    finally:
+        route = request.scope.get('route')
+        path = route.path if route is not None else 'unmatched'
+        REQUEST_LATENCY.labels(method=request.method, route=path).observe(time.perf_counter() - started)
+        REQUESTS.labels(method=request.method, route=path, status=str(status)).inc()
 
 # Redis connection (optional - gracefully handles missing Redis)
+# Uses the asyncio client so cache round trips never block the event loop
 redis_client = None
 try:
     redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
     if redis_url:
-        redis_client = redis.from_url(redis_url)
-        # Test connection
-        redis_client.ping()
+        redis_client = aioredis.from_url(redis_url)
 except Exception:
-    # Redis not available - continue without caching
     redis_client = None
 
+@app.on_event("startup")
+async def start_model_loading():
+    if ML_LAZY_STARTUP:
+        startup.load_in_background(model_reloaders)
+    model_watcher.start()
+
+@app.on_event("startup")
+async def check_redis():
+    """Test the Redis connection once the event loop is running"""
+    global redis_client
+    if redis_client:
+        try:
+            await redis_client.ping()
+        except Exception:
+            # Redis not available - continue with the in-process cache only
+            redis_client = None
+            prediction_cache.redis = None
+            stampede_guard.redis = None
+
+@app.on_event("shutdown")
+async def close_resources():
+    if redis_client:
+        await redis_client.close()
+    model_watcher.stop()
+    shutdown_executors()
+
 # Model registry path
 MODEL_PATH = os.getenv("ML_MODEL_PATH", "./models")
 
-# Import model loader
+# Upper bound on profile IDs accepted by a single /predict/batch call
+MAX_BATCH_SIZE = int(os.getenv("ML_MAX_BATCH_SIZE", "10000"))
+
+# Import model loader (models themselves are loaded further down)
 try:
-    from api.model_loader import predict_churn as ml_predict_churn, predict_ltv as ml_predict_ltv, predict_segment as ml_predict_segment, load_models
-    # Reload models on startup
-    print("Loading ML models on startup...")
-    load_models()
-    print("ML models loaded successfully")
+    with startup.timed('import:model_loader'):
+        from api.model_loader import predict_churn as ml_predict_churn, predict_ltv as ml_predict_ltv, predict_segment as ml_predict_segment, predict_batch as ml_predict_batch, predict_from_features as ml_predict_from_features, load_models
+        from api.model_loader import get_feature_dict, get_features_for_profiles, feature_row, score_churn, get_model_data, model_version as serving_model_version, brand_models
+        from api.feature_context import FeatureContext
     USE_TRAINED_MODELS = True
 except Exception as e:
     # Fallback if model_loader not available
@@ -68,11 +113,15 @@ except Exception as e:
     ml_predict_churn = None
     ml_predict_ltv = None
     ml_predict_segment = None
+    ml_predict_batch = None
+    ml_predict_from_features = None
+    FeatureContext = None
     USE_TRAINED_MODELS = False
 
 # Import model registry router
 try:
-    from api.model_registry import router as model_registry_router
+    with startup.timed('import:model_registry'):
+        from api.model_registry import router as model_registry_router
     app.include_router(model_registry_router)
     print("✅ Model registry API enabled")
 except Exception as e:
@@ -80,7 +129,8 @@ except Exception as e:
 
 # Import evaluation router
 try:
-    from api.evaluation import router as evaluation_router
+    with startup.timed('import:evaluation'):
+        from api.evaluation import router as evaluation_router
     app.include_router(evaluation_router)
     print("✅ Model evaluation API enabled")
 except Exception as e:
@@ -88,18 +138,38 @@ except Exception as e:
 
 # Import recommendation engine
 try:
-    from api.recommendation_engine import get_recommendations, load_recommendation_models
-    # Reload recommendation models on startup
-    load_recommendation_models()
+    with startup.timed('import:recommendation_engine'):
+        from api.recommendation_engine import get_recommendations, get_recommendations_batch, load_recommendation_models, has_recommendation_model, get_recommendation_model_version
     RECOMMENDATION_ENGINE_AVAILABLE = True
 except Exception as e:
     print(f"⚠️  Warning: Could not load recommendation engine: {e}")
     get_recommendations = None
+    get_recommendations_batch = None
+    has_recommendation_model = lambda: False
+    get_recommendation_model_version = lambda: None
     RECOMMENDATION_ENGINE_AVAILABLE = False
 
+# On-demand sampling profiler (POST /admin/profile, needs ML_ADMIN_TOKEN)
+from api.profiler import router as profiler_router
+app.include_router(profiler_router)
+
+# Per-process RSS/PSS (GET /admin/memory), e.g. to check pre-fork sharing
+from api.memory import router as memory_router, update_memory_gauges
+app.include_router(memory_router)
+
+# Import brand score export router
+try:
+    with startup.timed('import:export'):
+        from api.export import router as export_router
+    app.include_router(export_router)
+    print("✅ Score export API enabled")
+except Exception as e:
+    print(f"⚠️  Warning: Could not load export router: {e}")
+
 # Import LLM router
 try:
-    from api.llm_router import router as llm_router
+    with startup.timed('import:llm_router'):
+        from api.llm_router import router as llm_router
     app.include_router(llm_router)
     print("✅ LLM API enabled")
 except Exception as e:
@@ -107,14 +177,91 @@ except Exception as e:
 
 # Import intent predictor
 try:
-    from api.intent_predictor import get_intent_predictor
-    intent_predictor = get_intent_predictor()
+    with startup.timed('import:intent_predictor'):
+        from api.intent_predictor import get_intent_predictor
+    intent_predictor = get_intent_predictor(load=False)
     INTENT_PREDICTOR_AVAILABLE = True
 except Exception as e:
     print(f"⚠️  Warning: Could not load intent predictor: {e}")
     intent_predictor = None
     INTENT_PREDICTOR_AVAILABLE = False
 
+# Hot reload: newly activated (model_version.is_active) or newly trained
+# artifacts are loaded, warmed up and swapped in off the request path
+from api.model_watcher import ModelWatcher
+model_reloaders = {}
+if USE_TRAINED_MODELS:
+    model_reloaders['churn/ltv/segmentation'] = load_models
+if RECOMMENDATION_ENGINE_AVAILABLE:
+    model_reloaders['recommendations'] = load_recommendation_models
+if INTENT_PREDICTOR_AVAILABLE:
+    model_reloaders['intent'] = intent_predictor.refresh
+model_watcher = ModelWatcher(model_reloaders)
+
+# All artifacts load concurrently, each exactly once: before the app starts
+# serving by default, or in the background with ML_LAZY_STARTUP=true (the
+# load balancer should then route traffic only once /ready returns 200)
+if not ML_LAZY_STARTUP:
+    print("Loading ML models on startup...")
+    startup.load_all(model_reloaders)
+
+# Prediction cache: in-process LRU/TTL tier in front of Redis. Keys carry the
+# brand and the versions of the models behind each prediction kind.
+from api.prediction_cache import PredictionCache, LocalTTLCache, CACHE_REQUESTS
+
+CACHE_MODEL_TYPES = {
+    'churn': ['churn'],
+    'ltv': ['ltv'],
+    'recs': ['recommendations'],
+    'recs_batch': ['recommendations'],
+    'all': ['churn', 'ltv', 'segmentation', 'recommendations'],
+    'scores': ['churn', 'ltv', 'segmentation'],
+}
+
+def active_model_version(kind: str, brand_id: Optional[str] = None) -> str:
+    """Version tag for the models serving a prediction kind for a brand, e.g. '20251203_170104+none'"""
+    versions = []
+    for model_type in CACHE_MODEL_TYPES.get(kind, [kind]):
+        if model_type == 'recommendations':
+            version = get_recommendation_model_version() if get_recommendations else None
+        else:
+            version = serving_model_version(model_type, brand_id) if USE_TRAINED_MODELS else None
+        versions.append(str(version or 'none'))
+    return '+'.join(versions)
+
+prediction_cache = PredictionCache(redis_client, active_model_version)
+
+# Stampede protection: one computation per cold profile, per process and
+# (via a Redis lease) across workers; expired entries may be served stale
+# while a single worker refreshes them
+from api.singleflight import StampedeGuard
+ML_CACHE_STALE_WHILE_REVALIDATE = os.getenv("ML_CACHE_STALE_WHILE_REVALIDATE", "true").lower() == "true"
+stampede_guard = StampedeGuard(redis_client)
+
+# Scores materialized by the nightly bulk scoring job (train/bulk_score.py)
+# are served before falling back to on-demand scoring
+from api.precomputed import get_precomputed, PRECOMPUTED_MODEL_TYPES, PRECOMPUTED_RECS_TOP_K
+
+async def fetch_precomputed(
+    profile_ids: List[str],
+    model_types: List[str],
+    brand_id: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Current precomputed rows for profile_ids (empty if unavailable)"""
+    try:
+        return await run_db(get_precomputed, profile_ids, model_types, active_model_version('all', brand_id))
+    except Exception as e:
+        print(f"Precomputed prediction lookup failed: {e}")
+        return {}
+
+# Micro-batching: concurrent single-row requests share one vectorized predict
+from api.batching import MicroBatcher, ML_MICROBATCH_ENABLED
+churn_batcher = MicroBatcher('churn', score_churn) if (ML_MICROBATCH_ENABLED and USE_TRAINED_MODELS) else None
+intent_batcher = (
+    MicroBatcher('intent', intent_predictor.predict_proba_matrix)
+    if (ML_MICROBATCH_ENABLED and INTENT_PREDICTOR_AVAILABLE) else None
+)
+
 class PredictionRequest(BaseModel):
     profile_id: str
     brand_id: Optional[str] = None
@@ -128,21 +275,60 @@ class PredictionResponse(BaseModel):
     model_version: str
     timestamp: str
 
+class BatchPredictionRequest(BaseModel):
+    profile_ids: List[str]
+    brand_id: Optional[str] = None
+
+class BatchPredictionItem(BaseModel):
+    profile_id: str
+    churn_score: Optional[float] = None
+    ltv_score: Optional[float] = None
+    segment: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[BatchPredictionItem]
+    model_version: str
+    timestamp: str
+
+class RecommendationBatchRequest(BaseModel):
+    profile_ids: List[str]
+    brand_id: Optional[str] = None
+    top_k: int = Field(10, ge=1, le=100)
+
+class RecommendationBatchItem(BaseModel):
+    profile_id: str
+    recommendations: List[Dict[str, Any]]
+
+class RecommendationBatchResponse(BaseModel):
+    recommendations: List[RecommendationBatchItem]
+    model_version: str
+    timestamp: str
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics exposition"""
+    await prediction_cache.refresh_redis_stats()
+    update_pool_gauges(db.pool_stats(), executor_stats())
+    update_memory_gauges()
+    update_model_info({
+        'churn': active_model_version('churn'),
+        'ltv': active_model_version('ltv'),
+        'segmentation': active_model_version('segmentation'),
+        'recommendations': active_model_version('recommendations'),
+        'intent': intent_predictor.model_version if intent_predictor else None,
+    })
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/health")
 async def health():
     """Health check endpoint"""
-    db_status = "disconnected"
-    try:
-        conn = get_db_connection()
-        if conn:
-            conn.close()
-            db_status = "connected"
-    except Exception:
-        db_status = "disconnected"
+    db_status = "connected" if await run_db(db.check_health) else "disconnected"
     
     redis_status = "disconnected"
     try:
-        if redis_client and redis_client.ping():
+        if redis_client and await redis_client.ping():
             redis_status = "connected"
     except Exception:
         redis_status = "disconnected"
@@ -151,9 +337,25 @@ async def health():
         "status": "healthy",
         "database": db_status,
         "redis": redis_status,
+        "db_pool": db.pool_stats(),
+        "executors": executor_stats(),
+        "model_watcher": model_watcher.stats(),
+        "brand_models": brand_models.stats() if USE_TRAINED_MODELS else None,
+        "ready": startup.ready,
         "timestamp": datetime.utcnow().isoformat()
     }
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once model loading has finished, 503 before
+    Unlike /health (process liveness) this gates routing traffic here.
+    """
+    status = startup.status()
+    if not status['ready']:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
 @app.post("/predict/churn", response_model=PredictionResponse)
 async def predict_churn_endpoint(request: PredictionRequest):
     """
@@ -161,22 +363,34 @@ async def predict_churn_endpoint(request: PredictionRequest):
     Returns churn_score (0-1) where 1 = high churn risk
     """
     # Check cache first (if Redis available)
-    cache_key = f"churn:{request.profile_id}"
-    if redis_client:
-        try:
-            cached = redis_client.get(cache_key)
-            if cached:
-                return json.loads(cached)
-        except Exception:
-            pass  # Continue without cache
+    cached = await prediction_cache.get('churn', request.profile_id, request.brand_id)
+    if cached:
+        return cached
     
     # Try to use trained model
     churn_score = None
     model_version = "v1.0.0-mock"
     
-    if ml_predict_churn:
+    precomputed = (await fetch_precomputed([request.profile_id], ['churn'], request.brand_id)).get(request.profile_id)
+    if precomputed:
+        churn_score = precomputed['churn_score']
+        model_version = "v1.0.0-trained"
+    elif ml_predict_churn:
         try:
-            churn_score = ml_predict_churn(request.profile_id)
+            features = await run_db(get_feature_dict, request.profile_id)
+            # The micro-batcher scores with the shared model; brands with
+            # their own churn model are scored alone
+            churn_model = None if brand_models.has_model(request.brand_id, 'churn') else get_model_data('churn')
+            if features and churn_batcher and churn_model:
+                row = feature_row(features, churn_model['feature_cols'])
+                try:
+                    churn_score = float(await churn_batcher.submit(row))
+                except Exception as e:
+                    # e.g. a hot reload changed the feature columns mid-batch
+                    print(f"Batched churn prediction failed, scoring alone: {e}")
+                    churn_score = await run_inference(ml_predict_churn, request.profile_id, features, request.brand_id)
+            elif features:
+                churn_score = await run_inference(ml_predict_churn, request.profile_id, features, request.brand_id)
             if churn_score is not None:
                 model_version = "v1.0.0-trained"
         except Exception as e:
@@ -193,12 +407,8 @@ async def predict_churn_endpoint(request: PredictionRequest):
         timestamp=datetime.utcnow().isoformat()
     )
     
-    # Cache for 1 hour (if Redis available)
-    if redis_client:
-        try:
-            redis_client.setex(cache_key, 3600, response.json())
-        except Exception:
-            pass  # Continue without caching
+    # Cache in-process and in Redis (if available)
+    await prediction_cache.set('churn', request.profile_id, request.brand_id, response.model_dump(mode='json'))
     
     return response
 
@@ -210,14 +420,17 @@ async def predict_ltv(request: PredictionRequest):
     """
     model_version = "v1.0.0-mock"
     
-    cache_key = f"ltv:{request.profile_id}"
-    if redis_client:
-        cached = redis_client.get(cache_key)
-        if cached:
-            return json.loads(cached)
+    cached = await prediction_cache.get('ltv', request.profile_id, request.brand_id)
+    if cached:
+        return cached
     
-    # Mock prediction
-    ltv_score = 1500.0  # Placeholder
+    precomputed = (await fetch_precomputed([request.profile_id], ['ltv'], request.brand_id)).get(request.profile_id)
+    if precomputed:
+        ltv_score = precomputed['ltv_score']
+        model_version = "v1.0.0-trained"
+    else:
+        # Mock prediction
+        ltv_score = 1500.0  # Placeholder
     
     response = PredictionResponse(
         profile_id=request.profile_id,
@@ -226,8 +439,7 @@ async def predict_ltv(request: PredictionRequest):
         timestamp=datetime.utcnow().isoformat()
     )
     
-    if redis_client:
-        redis_client.setex(cache_key, 3600, response.json())
+    await prediction_cache.set('ltv', request.profile_id, request.brand_id, response.model_dump(mode='json'))
     
     return response
 
@@ -237,25 +449,29 @@ async def predict_recommendations(request: PredictionRequest):
     Get product/category recommendations for a customer profile
     Returns recommendations as array of {product_id, category, score}
     """
-    cache_key = f"recs:{request.profile_id}"
-    if redis_client:
-        try:
-            cached = redis_client.get(cache_key)
-            if cached:
-                return json.loads(cached)
-        except Exception:
-            pass  # Continue without cache
+    cached = await prediction_cache.get('recs', request.profile_id, request.brand_id)
+    if cached:
+        return cached
     
     # Try to use recommendation engine
     recommendations = None
     model_version = "v1.0.0-mock"
     
-    if get_recommendations:
+    precomputed = (await fetch_precomputed([request.profile_id], ['recommendations'], request.brand_id)).get(request.profile_id)
+    if precomputed:
+        recommendations = precomputed['recommendations'][:10]
+        model_version = "v1.0.0-trained"
+    elif get_recommendations:
         try:
-            recommendations = get_recommendations(
+            context = FeatureContext(request.profile_id, request.brand_id) if FeatureContext else None
+            if context and has_recommendation_model():
+                await run_db(lambda: context.purchase_history)
+            recommendations = await run_inference(
+                get_recommendations,
                 request.profile_id,
                 top_k=10,
-                brand_id=request.brand_id
+                brand_id=request.brand_id,
+                context=context
             )
             if recommendations:
                 model_version = "v1.0.0-trained"
@@ -276,55 +492,132 @@ async def predict_recommendations(request: PredictionRequest):
         timestamp=datetime.utcnow().isoformat()
     )
     
-    if redis_client:
-        try:
-            redis_client.setex(cache_key, 3600, response.json())
-        except Exception:
-            pass  # Continue without caching
+    await prediction_cache.set('recs', request.profile_id, request.brand_id, response.model_dump(mode='json'))
     
     return response
 
+@app.post("/predict/recs/batch", response_model=RecommendationBatchResponse)
+async def predict_recommendations_batch(request: RecommendationBatchRequest):
+    """
+    Top-K recommendations for many profiles in one call
+    Purchase histories are loaded with a single query and all customer
+    vectors are searched as one FAISS query matrix. Results keep the order
+    of profile_ids.
+    """
+    if len(request.profile_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(request.profile_ids)} profiles (max {MAX_BATCH_SIZE})"
+        )
+    
+    if not get_recommendations_batch or not has_recommendation_model():
+        raise HTTPException(status_code=503, detail="Recommendation model not available")
+    
+    # Cached lists computed for at least top_k items, then the precomputed rows
+    cached = {
+        pid: entry['recommendations'][:request.top_k]
+        for pid, entry in (await prediction_cache.get_many('recs_batch', request.profile_ids, request.brand_id)).items()
+        if entry['top_k'] >= request.top_k
+    }
+    to_score = [pid for pid in dict.fromkeys(request.profile_ids) if pid not in cached]
+    
+    scored: Dict[str, List[Dict[str, Any]]] = {}
+    if to_score and request.top_k <= PRECOMPUTED_RECS_TOP_K:
+        precomputed = await fetch_precomputed(to_score, ['recommendations'], request.brand_id)
+        for pid, row in precomputed.items():
+            scored[pid] = row['recommendations'][:request.top_k]
+        to_score = [pid for pid in to_score if pid not in precomputed]
+    
+    if to_score:
+        try:
+            computed = await run_inference(get_recommendations_batch, to_score, request.top_k, request.brand_id)
+        except Exception as e:
+            print(f"Batch recommendation error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        scored.update(computed)
+    
+    if scored:
+        await prediction_cache.set_many(
+            'recs_batch',
+            request.brand_id,
+            {pid: {'recommendations': recs, 'top_k': request.top_k} for pid, recs in scored.items()}
+        )
+    
+    return RecommendationBatchResponse(
+        recommendations=[
+            RecommendationBatchItem(profile_id=pid, recommendations=cached[pid] if pid in cached else scored[pid])
+            for pid in request.profile_ids
+        ],
+        model_version="v1.0.0-trained",
+        timestamp=datetime.utcnow().isoformat()
+    )
+
 @app.post("/predict/all", response_model=PredictionResponse)
 async def predict_all(request: PredictionRequest):
     """
     Get all predictions (churn, LTV, recommendations, segment) in one call
     """
-    cache_key = f"all:{request.profile_id}"
-    if redis_client:
-        try:
-            cached = redis_client.get(cache_key)
-            if cached:
-                return json.loads(cached)
-        except Exception:
-            pass  # Continue without cache
+    profile_id, brand_id = request.profile_id, request.brand_id
+    cached = await prediction_cache.get_entry('all', profile_id, brand_id)
+    if cached:
+        value, stale = cached
+        if not stale:
+            return value
+        if ML_CACHE_STALE_WHILE_REVALIDATE:
+            stampede_guard.revalidate(
+                prediction_cache.key('all', profile_id, brand_id),
+                lambda: compute_all_predictions(profile_id, brand_id)
+            )
+            return value
+    
+    # Concurrent misses for the same profile share one computation
+    return await stampede_guard.load(
+        prediction_cache.key('all', profile_id, brand_id),
+        lambda: compute_all_predictions(profile_id, brand_id),
+        lambda: prediction_cache.get('all', profile_id, brand_id)
+    )
+
+async def compute_all_predictions(profile_id: str, brand_id: Optional[str]) -> Dict[str, Any]:
+    """Run every model for a profile (or use its precomputed row) and cache the combined response"""
+    precomputed = (await fetch_precomputed([profile_id], PRECOMPUTED_MODEL_TYPES, brand_id)).get(profile_id)
+    if precomputed:
+        result = PredictionResponse(
+            profile_id=profile_id,
+            churn_score=precomputed['churn_score'],
+            ltv_score=precomputed['ltv_score'],
+            recommendations=precomputed['recommendations'][:5],
+            segment=precomputed['segment'],
+            model_version="v1.0.0-trained",
+            timestamp=datetime.utcnow().isoformat()
+        ).model_dump(mode='json')
+        await prediction_cache.set('all', profile_id, brand_id, result)
+        return result
     
     # Try to use trained models
     churn_score = None
     ltv_score = None
     segment = None
     model_version = "v1.0.0-mock"
+    context = FeatureContext(profile_id, brand_id) if FeatureContext else None
     
-    if ml_predict_churn:
-        try:
-            churn_score = ml_predict_churn(request.profile_id)
-            if churn_score is not None:
-                model_version = "v1.0.0-trained"
-        except Exception:
-            pass
-    
-    if ml_predict_ltv:
-        try:
-            ltv_score = ml_predict_ltv(request.profile_id)
-            if ltv_score is not None and model_version == "v1.0.0-mock":
-                model_version = "v1.0.0-trained"
-        except Exception:
-            pass
+    # Features and purchase history are loaded once, concurrently, and shared by every model below
+    if context:
+        prefetch = [run_db(lambda: context.features)]
+        if get_recommendations and has_recommendation_model():
+            prefetch.append(run_db(lambda: context.purchase_history))
+        with span('prefetch'):
+            await asyncio.gather(*prefetch, return_exceptions=True)
     
-    if ml_predict_segment:
+    if ml_predict_from_features:
         try:
-            segment = ml_predict_segment(request.profile_id)
-            if segment is not None and model_version == "v1.0.0-mock":
-                model_version = "v1.0.0-trained"
+            features = context.features
+            if features:
+                scores = await run_inference(ml_predict_from_features, features, brand_id)
+                churn_score = scores['churn_score']
+                ltv_score = scores['ltv_score']
+                segment = scores['segment']
+                if any(v is not None for v in scores.values()):
+                    model_version = "v1.0.0-trained"
         except Exception:
             pass
     
@@ -340,10 +633,12 @@ async def predict_all(request: PredictionRequest):
     recommendations = None
     if get_recommendations:
         try:
-            recommendations = get_recommendations(
-                request.profile_id,
+            recommendations = await run_inference(
+                get_recommendations,
+                profile_id,
                 top_k=5,
-                brand_id=request.brand_id
+                brand_id=brand_id,
+                context=context
             )
         except Exception:
             pass
@@ -355,7 +650,7 @@ async def predict_all(request: PredictionRequest):
         ]
     
     response = PredictionResponse(
-        profile_id=request.profile_id,
+        profile_id=profile_id,
         churn_score=churn_score,
         ltv_score=ltv_score,
         recommendations=recommendations,
@@ -364,13 +659,67 @@ async def predict_all(request: PredictionRequest):
         timestamp=datetime.utcnow().isoformat()
     )
     
-    if redis_client:
+    result = response.model_dump(mode='json')
+    await prediction_cache.set('all', profile_id, brand_id, result)
+    
+    return result
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(request: BatchPredictionRequest):
+    """
+    Score churn, LTV and segment for many profiles in one call
+    Features are loaded with a single query and each model runs once over the
+    whole feature matrix. Results keep the order of profile_ids; profiles that
+    could not be scored carry an error instead of failing the batch.
+    """
+    if len(request.profile_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(request.profile_ids)} profiles (max {MAX_BATCH_SIZE})"
+        )
+    
+    if not ml_predict_batch:
+        raise HTTPException(status_code=503, detail="Trained models not available")
+    
+    # Serve what we can from the cache (one local pass + one Redis MGET)
+    cached = await prediction_cache.get_many('scores', request.profile_ids, request.brand_id)
+    to_score = [pid for pid in dict.fromkeys(request.profile_ids) if pid not in cached]
+    
+    # Then from the nightly precomputed rows, scoring only what is left
+    scored: Dict[str, Dict[str, Any]] = {}
+    if to_score:
+        precomputed = await fetch_precomputed(to_score, ['churn', 'ltv', 'segmentation'], request.brand_id)
+        for pid, row in precomputed.items():
+            scored[pid] = {
+                'profile_id': pid,
+                'churn_score': row['churn_score'],
+                'ltv_score': row['ltv_score'],
+                'segment': row['segment'],
+                'error': None,
+            }
+        to_score = [pid for pid in to_score if pid not in precomputed]
+    
+    if to_score:
         try:
-            redis_client.setex(cache_key, 3600, response.json())
-        except Exception:
-            pass  # Continue without caching
+            features_by_profile = await run_db(get_features_for_profiles, to_score)
+            results = await run_inference(ml_predict_batch, to_score, features_by_profile, request.brand_id)
+        except Exception as e:
+            print(f"Batch prediction error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        scored.update({result['profile_id']: result for result in results})
     
-    return response
+    if scored:
+        await prediction_cache.set_many(
+            'scores',
+            request.brand_id,
+            {pid: result for pid, result in scored.items() if not result['error']}
+        )
+    
+    return BatchPredictionResponse(
+        predictions=[BatchPredictionItem(**(cached.get(pid) or scored[pid])) for pid in request.profile_ids],
+        model_version="v1.0.0-trained",
+        timestamp=datetime.utcnow().isoformat()
+    )
 
 class IntentPredictionRequest(BaseModel):
     profile_id: str
@@ -392,6 +741,96 @@ class IntentPredictionResponse(BaseModel):
     model_version: Optional[str] = None
     timestamp: str
 
+class IntentBatchPredictionRequest(BaseModel):
+    items: List[IntentPredictionRequest]
+
+class IntentBatchPredictionResponse(BaseModel):
+    predictions: List[IntentPredictionResponse]
+    model_version: Optional[str] = None
+    timestamp: str
+
+# lifetime_value / total_orders / profile_strength change slowly; a short
+# TTL lets repeated intent calls for a profile skip the customer_profile read
+profile_attribute_cache = LocalTTLCache(
+    max_entries=int(os.getenv("ML_PROFILE_ATTR_CACHE_MAX_ENTRIES", "50000")),
+    ttl=float(os.getenv("ML_PROFILE_ATTR_CACHE_TTL", "300")),
+    tier='profile_attributes'
+)
+
+def fetch_profile_attributes_many(profile_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    lifetime_value, total_orders and profile_strength for many profiles
+    Cached profiles are served from profile_attribute_cache; the rest are
+    read with one query. Unknown profiles are absent from the result.
+    """
+    attributes: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for profile_id in dict.fromkeys(profile_ids):
+        cached = profile_attribute_cache.get(profile_id)
+        if cached is not None:
+            attributes[profile_id] = cached
+        else:
+            missing.append(profile_id)
+    CACHE_REQUESTS.labels(tier='profile_attributes', result='hit').inc(len(attributes))
+    CACHE_REQUESTS.labels(tier='profile_attributes', result='miss').inc(len(missing))
+    
+    if missing:
+        with timed_stage('profile_attributes'), db.db_cursor() as cursor:
+            cursor.execute("""
+                SELECT id, lifetime_value, total_orders, profile_strength
+                FROM customer_profile
+                WHERE id = ANY(%s)
+            """, (missing,))
+            rows = cursor.fetchall()
+        for row in rows:
+            profile = {
+                'lifetime_value': row['lifetime_value'],
+                'total_orders': row['total_orders'],
+                'profile_strength': row['profile_strength'],
+            }
+            profile_attribute_cache.set(row['id'], profile)
+            attributes[row['id']] = profile
+    
+    return attributes
+
+def build_intent_features(request: IntentPredictionRequest, profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Intent model features for a request, with missing profile attributes taken from profile"""
+    if request.lifetime_value is None or request.total_orders is None:
+        if profile:
+            lifetime_value = float(request.lifetime_value or profile['lifetime_value'] or 0)
+            total_orders = int(request.total_orders or profile['total_orders'] or 0)
+            profile_strength = int(request.profile_strength or profile['profile_strength'] or 0)
+        else:
+            lifetime_value = request.lifetime_value or 0
+            total_orders = request.total_orders or 0
+            profile_strength = request.profile_strength or 0
+    else:
+        lifetime_value = request.lifetime_value
+        total_orders = request.total_orders
+        profile_strength = request.profile_strength or 0
+    
+    return {
+        'intent_score': request.intent_score,
+        'intent_type': request.intent_type,
+        'view_duration': request.view_duration or 0,
+        'hours_since_last_view': request.hours_since_last_view or 24,
+        'days_since_first_view': request.days_since_first_view or 1,
+        'lifetime_value': lifetime_value,
+        'total_orders': total_orders,
+        'profile_strength': profile_strength,
+    }
+
+async def resolve_profile_attributes(requests: List[IntentPredictionRequest]) -> Dict[str, Dict[str, Any]]:
+    """Profile attributes for the requests that did not supply them"""
+    profile_ids = [r.profile_id for r in requests if r.lifetime_value is None or r.total_orders is None]
+    if not profile_ids:
+        return {}
+    try:
+        return await run_db(fetch_profile_attributes_many, profile_ids)
+    except Exception as e:
+        print(f"Error fetching profile for intent: {e}")
+        return {}
+
 @app.post("/predict/intent", response_model=IntentPredictionResponse)
 async def predict_intent(request: IntentPredictionRequest):
     """
@@ -403,47 +842,19 @@ async def predict_intent(request: IntentPredictionRequest):
     
     try:
         # Get customer profile data if not provided
-        if request.lifetime_value is None or request.total_orders is None:
-            conn = get_db_connection()
-            if conn:
-                cursor = conn.cursor(cursor_factory=RealDictCursor)
-                cursor.execute("""
-                    SELECT lifetime_value, total_orders, profile_strength
-                    FROM customer_profile
-                    WHERE id = %s
-                """, (request.profile_id,))
-                profile = cursor.fetchone()
-                cursor.close()
-                conn.close()
-                
-                if profile:
-                    lifetime_value = float(request.lifetime_value or profile['lifetime_value'] or 0)
-                    total_orders = int(request.total_orders or profile['total_orders'] or 0)
-                    profile_strength = int(request.profile_strength or profile['profile_strength'] or 0)
-                else:
-                    lifetime_value = request.lifetime_value or 0
-                    total_orders = request.total_orders or 0
-                    profile_strength = request.profile_strength or 0
-            else:
-                lifetime_value = request.lifetime_value or 0
-                total_orders = request.total_orders or 0
-                profile_strength = request.profile_strength or 0
-        else:
-            lifetime_value = request.lifetime_value
-            total_orders = request.total_orders
-            profile_strength = request.profile_strength or 0
+        profiles = await resolve_profile_attributes([request])
+        features = build_intent_features(request, profiles.get(request.profile_id))
         
-        # Predict
-        result = intent_predictor.predict({
-            'intent_score': request.intent_score,
-            'intent_type': request.intent_type,
-            'view_duration': request.view_duration or 0,
-            'hours_since_last_view': request.hours_since_last_view or 24,
-            'days_since_first_view': request.days_since_first_view or 1,
-            'lifetime_value': lifetime_value,
-            'total_orders': total_orders,
-            'profile_strength': profile_strength,
-        })
+        # Predict (coalesced with concurrent requests when the model is loaded)
+        if intent_batcher and intent_predictor.model is not None:
+            probability = float(await intent_batcher.submit(intent_predictor.feature_vector(features)))
+            result = {
+                'probability': probability,
+                'prediction': int(probability > 0.5),
+                'model_version': intent_predictor.model_version,
+            }
+        else:
+            result = await run_inference(intent_predictor.predict, features)
         
         return IntentPredictionResponse(
             profile_id=request.profile_id,
@@ -457,6 +868,49 @@ async def predict_intent(request: IntentPredictionRequest):
         print(f"Error predicting intent: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/predict/intent/batch", response_model=IntentBatchPredictionResponse)
+async def predict_intent_batch(request: IntentBatchPredictionRequest):
+    """
+    Predict purchase probability for many (profile, product) intents
+    Missing profile attributes are resolved with one query (plus a TTL
+    cache) and the model runs once over the whole feature matrix.
+    Results keep the order of items.
+    """
+    if not intent_predictor:
+        raise HTTPException(status_code=503, detail="Intent predictor not available")
+    
+    if len(request.items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(request.items)} items (max {MAX_BATCH_SIZE})"
+        )
+    
+    try:
+        profiles = await resolve_profile_attributes(request.items)
+        features_list = [build_intent_features(item, profiles.get(item.profile_id)) for item in request.items]
+        results = await run_inference(intent_predictor.predict_batch, features_list)
+    except Exception as e:
+        print(f"Error predicting intent batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    timestamp = datetime.utcnow().isoformat()
+    model_version = results[0].get('model_version') if results else intent_predictor.model_version
+    return IntentBatchPredictionResponse(
+        predictions=[
+            IntentPredictionResponse(
+                profile_id=item.profile_id,
+                product_id=item.product_id,
+                probability=result['probability'],
+                prediction=result['prediction'],
+                model_version=result.get('model_version'),
+                timestamp=timestamp
+            )
+            for item, result in zip(request.items, results)
+        ],
+        model_version=model_version,
+        timestamp=timestamp
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("ML_SERVICE_PORT", 8000)))
@@ -0,0 +1,130 @@
+# GENERATOR: ML_PERFORMANCE
+# Per-process memory (RSS/PSS, shared vs private) of the serving processes
+# HOW TO USE: curl -H "X-Admin-Token: $ML_ADMIN_TOKEN" http://localhost:8000/admin/memory
+# RSS counts every page a process maps, so summing it over pre-forked
+# workers counts the shared models once per worker. PSS divides each shared
+# page between the processes mapping it; the PSS total is what the service
+# really uses. Read from /proc/<pid>/smaps_rollup (Linux); elsewhere only
+# this process' RSS from the resource module is available.
+
+import os
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Header
+from prometheus_client import Gauge
+
+from api.profiler import check_admin_token
+
+# Set by api/prefork.py in the master before forking; inherited by workers
+PREFORK_MASTER_ENV = "ML_PREFORK_MASTER_PID"
+
+SMAPS_FIELDS = {
+    'Rss': 'rss_bytes',
+    'Pss': 'pss_bytes',
+    'Shared_Clean': 'shared_clean_bytes',
+    'Shared_Dirty': 'shared_dirty_bytes',
+    'Private_Clean': 'private_clean_bytes',
+    'Private_Dirty': 'private_dirty_bytes',
+    'Swap': 'swap_bytes',
+}
+
+PROCESS_PSS = Gauge('ml_process_pss_bytes', 'Proportional set size of this serving process')
+PROCESS_SHARED = Gauge('ml_process_shared_bytes', 'Resident memory of this process shared with other processes')
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def read_memory(pid: int) -> Optional[Dict[str, int]]:
+    """Memory counters of a process in bytes, or None if it cannot be read"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return _fallback_memory(pid)
+
+    memory: Dict[str, int] = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(':') in SMAPS_FIELDS:
+            memory[SMAPS_FIELDS[parts[0].rstrip(':')]] = int(parts[1]) * 1024
+    return memory
+
+
+def _fallback_memory(pid: int) -> Optional[Dict[str, int]]:
+    """RSS only, for kernels/platforms without smaps_rollup"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return {'rss_bytes': int(line.split()[1]) * 1024}
+    except OSError:
+        pass
+    if pid == os.getpid():
+        import resource
+        import sys
+        # ru_maxrss is peak RSS, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss_bytes': peak if sys.platform == 'darwin' else peak * 1024}
+    return None
+
+
+def child_pids(parent: int) -> List[int]:
+    """PIDs whose parent is `parent`, from /proc/<pid>/stat"""
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the parenthesized command name: state, ppid, ...
+        fields = stat[stat.rfind(')') + 2:].split()
+        if len(fields) > 1 and int(fields[1]) == parent:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def serving_memory() -> Dict[str, Any]:
+    """Memory of the master and every worker (pre-fork mode) or of this process"""
+    master = int(os.environ.get(PREFORK_MASTER_ENV, "0"))
+    if master and os.path.exists('/proc'):
+        processes = [('master', master)] + [('worker', pid) for pid in child_pids(master)]
+    else:
+        processes = [('worker', os.getpid())]
+
+    report = []
+    for role, pid in processes:
+        memory = read_memory(pid)
+        if memory is not None:
+            report.append({'pid': pid, 'role': role, 'self': pid == os.getpid(), **memory})
+
+    totals = {
+        key: sum(entry.get(key, 0) for entry in report)
+        for key in ('rss_bytes', 'pss_bytes')
+    }
+    return {
+        'mode': 'prefork' if master else 'single',
+        'processes': report,
+        'totals': totals,
+    }
+
+
+def update_memory_gauges() -> None:
+    """Set the PSS/shared gauges for this process (called on /metrics scrape)"""
+    memory = read_memory(os.getpid()) or {}
+    if 'pss_bytes' in memory:
+        PROCESS_PSS.set(memory['pss_bytes'])
+        PROCESS_SHARED.set(memory.get('shared_clean_bytes', 0) + memory.get('shared_dirty_bytes', 0))
+
+
+@router.get("/memory")
+async def memory(x_admin_token: Optional[str] = Header(None)):
+    """
+    RSS/PSS of every serving process
+    In pre-fork mode the per-worker PSS is well below RSS when the models
+    loaded by the master are still shared.
+    """
+    check_admin_token(x_admin_token)
+    return serving_memory()
@@ -0,0 +1,128 @@
+# GENERATOR: ML_PERFORMANCE
+# Prometheus metrics for the ML service
+# HOW TO USE: from api.metrics import BATCH_SIZE; BATCH_SIZE.labels(model='churn').observe(n)
+#             with timed_stage('feature_fetch'): ...   /   @timed_stage('inference', 'churn')
+#   Scraped from GET /metrics (see api.main)
+# Everything here is a counter/histogram update or a gauge refreshed at
+# scrape time, cheap enough to stay enabled in production. Cache hit ratio:
+#   sum by (tier) (rate(ml_cache_requests_total{result="hit"}[5m]))
+#     / sum by (tier) (rate(ml_cache_requests_total[5m]))
+
+import functools
+import time
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from api.tracing import record as record_span
+
+# Request latency per route template (not raw path, to bound cardinality)
+REQUEST_LATENCY = Histogram(
+    'ml_request_duration_seconds',
+    'HTTP request latency by route',
+    ['method', 'route'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS = Counter(
+    'ml_requests_total',
+    'HTTP requests by route and status code',
+    ['method', 'route', 'status'],
+)
+
+# Where request time goes: cache_lookup, precomputed_lookup, feature_fetch,
+# purchase_history, profile_attributes, inference (per model), faiss_search,
+# ollama_call
+STAGE_LATENCY = Histogram(
+    'ml_stage_duration_seconds',
+    'Latency of one processing stage',
+    ['stage', 'model'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0, 30.0),
+)
+
+# Pool saturation, refreshed at scrape time
+POOL_IN_USE = Gauge('ml_pool_in_use', 'Checked-out connections / busy workers', ['pool'])
+POOL_SIZE = Gauge('ml_pool_size', 'Configured maximum connections / workers', ['pool'])
+POOL_QUEUED = Gauge('ml_pool_queued', 'Work items waiting for a worker thread', ['pool'])
+DB_POOL_TIMEOUTS = Gauge('ml_db_pool_timeouts', 'Connection checkouts that timed out (since start)')
+
+MODEL_INFO = Gauge(
+    'ml_model_info',
+    'Loaded model versions (value is always 1)',
+    ['model', 'version'],
+)
+
+# Micro-batching (api.batching)
+BATCH_QUEUE_WAIT = Histogram(
+    'ml_batch_queue_wait_seconds',
+    'Time a request waited in the micro-batch queue before inference started',
+    ['model'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+BATCH_SIZE = Histogram(
+    'ml_batch_size_rows',
+    'Rows per coalesced inference call',
+    ['model'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+
+
+class _StageTimer:
+    """Observes STAGE_LATENCY and adds a span to the request trace (api.tracing)"""
+
+    def __init__(self, stage: str, model: str = ''):
+        self._histogram = STAGE_LATENCY.labels(stage=stage, model=model)
+        self._name = f"{stage}.{model}" if model else stage
+        self._started = 0.0
+
+    def __enter__(self) -> '_StageTimer':
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self._started
+        self._histogram.observe(elapsed)
+        record_span(self._name, elapsed)
+
+    def __call__(self, fn: Callable) -> Callable:
+        histogram, name = self._histogram, self._name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                histogram.observe(elapsed)
+                record_span(name, elapsed)
+        return wrapper
+
+
+def timed_stage(stage: str, model: str = '') -> _StageTimer:
+    """Context manager / decorator recording a stage's duration (metric and trace span)"""
+    return _StageTimer(stage, model)
+
+
+def update_pool_gauges(db_stats: Optional[Dict[str, Any]], executor_stats: Dict[str, Dict[str, int]]) -> None:
+    """Copy connection pool and executor counters into gauges"""
+    if db_stats:
+        POOL_IN_USE.labels(pool='db_connections').set(db_stats['in_use'])
+        POOL_SIZE.labels(pool='db_connections').set(db_stats['max'])
+        DB_POOL_TIMEOUTS.set(db_stats['timeouts'])
+    for name, stats in executor_stats.items():
+        POOL_SIZE.labels(pool=f'{name}_threads').set(stats['max_workers'])
+        POOL_IN_USE.labels(pool=f'{name}_threads').set(stats['busy'])
+        POOL_QUEUED.labels(pool=f'{name}_threads').set(stats['queued'])
+
+
+def update_model_info(versions: Dict[str, Optional[str]]) -> None:
+    """Replace the ml_model_info series with the currently loaded versions"""
+    MODEL_INFO.clear()
+    for model, version in versions.items():
+        if version and version != 'none':
+            MODEL_INFO.labels(model=model, version=str(version)).set(1)
+
+
+def render_latest() -> tuple:
+    """(body, content_type) for the Prometheus text exposition"""
+    return generate_latest(), CONTENT_TYPE_LATEST
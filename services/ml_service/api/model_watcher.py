@@ -0,0 +1,68 @@
+# GENERATOR: ML_PERFORMANCE
+# Background hot reload of serving models
+# HOW TO USE: watcher = ModelWatcher(reloaders); watcher.start() ... watcher.stop()
+# Every ML_MODEL_WATCH_INTERVAL seconds each reloader re-checks the
+# model_version registry and the model directory. Reloaders load and warm
+# up new artifacts on this thread and swap them in atomically, so requests
+# keep being served by the old model until the new one is ready.
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Seconds between checks; 0 disables the watcher
+ML_MODEL_WATCH_INTERVAL = float(os.getenv("ML_MODEL_WATCH_INTERVAL", "30"))
+
+
+class ModelWatcher:
+    """Daemon thread that periodically calls named reload functions"""
+
+    def __init__(
+        self,
+        reloaders: Dict[str, Callable[[], object]],
+        interval: float = ML_MODEL_WATCH_INTERVAL,
+    ):
+        self.reloaders = reloaders
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_check: Optional[float] = None
+        self.reload_count = 0
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def check_now(self) -> None:
+        """Run every reloader once; a truthy result means a new model went live"""
+        for name, reload in self.reloaders.items():
+            try:
+                changed = reload()
+            except Exception as e:
+                print(f"Model reload check failed for {name}: {e}")
+                continue
+            if changed:
+                self.reload_count += 1
+                print(f"🔄 Hot-reloaded {name} model")
+        self.last_check = time.time()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check_now()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'interval': self.interval,
+            'running': self._thread is not None,
+            'last_check': self.last_check,
+            'reloads': self.reload_count,
+        }
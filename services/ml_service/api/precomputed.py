@@ -0,0 +1,75 @@
+# GENERATOR: ML_PERFORMANCE
+# Serve rows materialized in `predictions` by train/bulk_score.py
+# HOW TO USE: rows = get_precomputed(profile_ids, ['churn'], active_model_version('all'))
+# A row is only served if the model versions it was scored with match the
+# models serving now (per field, so a new recommendation model does not
+# invalidate churn scores) and it is younger than ML_PRECOMPUTED_MAX_AGE_HOURS.
+# Rows written by anything else (e.g. mock data with model_version 'v1.0')
+# never match and fall through to on-demand scoring.
+
+import os
+from typing import Any, Dict, List
+
+from api.db import db_cursor
+from api.metrics import timed_stage
+
+ML_SERVE_PRECOMPUTED = os.getenv("ML_SERVE_PRECOMPUTED", "true").lower() == "true"
+ML_PRECOMPUTED_MAX_AGE_HOURS = float(os.getenv("ML_PRECOMPUTED_MAX_AGE_HOURS", "36"))
+
+# Component order of predictions.model_version, e.g. 'v1+v2+v3+v4'
+PRECOMPUTED_MODEL_TYPES = ['churn', 'ltv', 'segmentation', 'recommendations']
+# Recommendations are stored at the largest top_k any endpoint serves
+PRECOMPUTED_RECS_TOP_K = 10
+
+MODEL_FIELDS = {
+    'churn': 'churn_score',
+    'ltv': 'ltv_score',
+    'segmentation': 'segment',
+    'recommendations': 'recommendations',
+}
+
+
+def is_current(row_version: str, active_version: str, model_types: List[str]) -> bool:
+    """True if every model in model_types has the same, real version in both tags"""
+    row_parts = (row_version or '').split('+')
+    active_parts = active_version.split('+')
+    if len(row_parts) != len(PRECOMPUTED_MODEL_TYPES) or len(active_parts) != len(PRECOMPUTED_MODEL_TYPES):
+        return False
+    for model_type in model_types:
+        i = PRECOMPUTED_MODEL_TYPES.index(model_type)
+        if active_parts[i] == 'none' or row_parts[i] != active_parts[i]:
+            return False
+    return True
+
+
+@timed_stage('precomputed_lookup')
+def get_precomputed(
+    profile_ids: List[str],
+    model_types: List[str],
+    active_version: str
+) -> Dict[str, Dict[str, Any]]:
+    """
+    profile_id -> predictions row for profiles with current scores for model_types
+
+    One primary-key query for all profiles. Profiles without a row, with a
+    stale row or with a null value for a requested field are absent.
+    """
+    if not ML_SERVE_PRECOMPUTED or not profile_ids:
+        return {}
+
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT profile_id, churn_score, ltv_score, segment, recommendations, model_version
+            FROM predictions
+            WHERE profile_id = ANY(%s)
+            AND updated_at >= NOW() - make_interval(secs => %s)
+        """, [list(set(profile_ids)), ML_PRECOMPUTED_MAX_AGE_HOURS * 3600])
+        rows = cursor.fetchall()
+
+    fields = [MODEL_FIELDS[model_type] for model_type in model_types]
+    return {
+        row['profile_id']: row
+        for row in rows
+        if is_current(row['model_version'], active_version, model_types)
+        and all(row[field] is not None for field in fields)
+    }
@@ -0,0 +1,234 @@
+# GENERATOR: ML_PERFORMANCE
+# Two-tier prediction cache: in-process LRU/TTL in front of Redis
+# HOW TO USE: cache = PredictionCache(redis_client, version_resolver)
+#             cached = await cache.get('churn', profile_id, brand_id)
+#             await cache.set('churn', profile_id, brand_id, response_dict)
+# Keys embed brand and active model version, so activating a model
+# naturally bypasses scores cached for the previous one.
+# Entries stay in Redis ML_CACHE_STALE_TTL seconds past their freshness
+# window so get_entry() can serve them stale while one worker refreshes.
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from api.metrics import timed_stage
+
+ML_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("ML_CACHE_LOCAL_MAX_ENTRIES", "10000"))
+ML_CACHE_LOCAL_TTL = float(os.getenv("ML_CACHE_LOCAL_TTL", "60"))
+ML_CACHE_REDIS_TTL = int(os.getenv("ML_CACHE_REDIS_TTL", "3600"))
+# Extra seconds an expired entry is kept for stale-while-revalidate
+ML_CACHE_STALE_TTL = int(os.getenv("ML_CACHE_STALE_TTL", "600"))
+
+CACHE_REQUESTS = Counter(
+    'ml_cache_requests_total',
+    'Prediction cache lookups by tier and result',
+    ['tier', 'result'],
+)
+CACHE_EVICTIONS = Counter(
+    'ml_cache_evictions_total',
+    'Entries dropped from the in-process tier (size bound or TTL expiry)',
+    ['tier', 'reason'],
+)
+REDIS_EVICTED_KEYS = Gauge(
+    'ml_cache_redis_evicted_keys',
+    'evicted_keys reported by Redis INFO (server-wide)',
+)
+
+
+class LocalTTLCache:
+    """Size-bounded LRU with a per-entry TTL"""
+
+    def __init__(
+        self,
+        max_entries: int = ML_CACHE_LOCAL_MAX_ENTRIES,
+        ttl: float = ML_CACHE_LOCAL_TTL,
+        tier: str = 'local'
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.tier = tier
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                CACHE_EVICTIONS.labels(tier=self.tier, reason='expired').inc()
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                CACHE_EVICTIONS.labels(tier=self.tier, reason='size').inc()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PredictionCache:
+    """
+    Local LRU/TTL tier backed by Redis (optional).
+
+    version_resolver(kind, brand_id) returns the active model version string
+    for a prediction kind ('churn', 'all', ...) and brand; it is part of
+    every key.
+    Values are stored as {'value': ..., 'fresh_until': epoch seconds}.
+    """
+
+    def __init__(
+        self,
+        redis_client: Any,
+        version_resolver: Callable[[str, Optional[str]], str],
+        local: Optional[LocalTTLCache] = None,
+        redis_ttl: int = ML_CACHE_REDIS_TTL,
+        stale_ttl: int = ML_CACHE_STALE_TTL,
+    ):
+        self.redis = redis_client
+        self.version_resolver = version_resolver
+        self.local = local if local is not None else LocalTTLCache()
+        self.redis_ttl = redis_ttl
+        self.stale_ttl = stale_ttl
+
+    def key_prefix(self, kind: str, brand_id: Optional[str] = None) -> str:
+        return f"pred:{kind}:{brand_id or '_'}:{self.version_resolver(kind, brand_id)}:"
+
+    def key(self, kind: str, profile_id: str, brand_id: Optional[str] = None) -> str:
+        return self.key_prefix(kind, brand_id) + profile_id
+
+    async def get(self, kind: str, profile_id: str, brand_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return (await self.get_many(kind, [profile_id], brand_id)).get(profile_id)
+
+    async def get_entry(
+        self,
+        kind: str,
+        profile_id: str,
+        brand_id: Optional[str] = None
+    ) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """(value, is_stale) including entries past their freshness window"""
+        with timed_stage('cache_lookup', kind):
+            envelope = (await self._lookup_many(kind, [profile_id], brand_id)).get(profile_id)
+        if envelope is None:
+            return None
+        return envelope['value'], envelope['fresh_until'] < time.time()
+
+    async def set(self, kind: str, profile_id: str, brand_id: Optional[str], value: Dict[str, Any]) -> None:
+        await self.set_many(kind, brand_id, {profile_id: value})
+
+    async def get_many(
+        self,
+        kind: str,
+        profile_ids: List[str],
+        brand_id: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Fresh cached values by profile_id"""
+        now = time.time()
+        with timed_stage('cache_lookup', kind):
+            envelopes = await self._lookup_many(kind, profile_ids, brand_id)
+        return {
+            profile_id: envelope['value']
+            for profile_id, envelope in envelopes.items()
+            if envelope['fresh_until'] >= now
+        }
+
+    async def _lookup_many(
+        self,
+        kind: str,
+        profile_ids: List[str],
+        brand_id: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Envelopes by profile_id; local tier first, one MGET for the rest.
+        A stale local entry still asks Redis, which may hold a fresher one."""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[Tuple[str, str]] = []
+
+        now = time.time()
+        prefix = self.key_prefix(kind, brand_id)
+        for profile_id in dict.fromkeys(profile_ids):
+            key = prefix + profile_id
+            envelope = self.local.get(key)
+            if envelope is not None:
+                found[profile_id] = envelope
+            if envelope is None or envelope['fresh_until'] < now:
+                missing.append((profile_id, key))
+        CACHE_REQUESTS.labels(tier='local', result='hit').inc(len(dict.fromkeys(profile_ids)) - len(missing))
+        CACHE_REQUESTS.labels(tier='local', result='miss').inc(len(missing))
+
+        if not missing or not self.redis:
+            return found
+
+        try:
+            raw_values = await self.redis.mget([key for _, key in missing])
+        except Exception:
+            return found  # Continue without Redis
+
+        hits = 0
+        for (profile_id, key), raw in zip(missing, raw_values):
+            if raw is None:
+                continue
+            try:
+                envelope = json.loads(raw)
+                envelope['fresh_until']
+            except (ValueError, TypeError, KeyError):
+                continue
+            hits += 1
+            current = found.get(profile_id)
+            if current is None or envelope['fresh_until'] > current['fresh_until']:
+                found[profile_id] = envelope
+                self.local.set(key, envelope)
+        CACHE_REQUESTS.labels(tier='redis', result='hit').inc(hits)
+        CACHE_REQUESTS.labels(tier='redis', result='miss').inc(len(missing) - hits)
+        return found
+
+    async def set_many(self, kind: str, brand_id: Optional[str], values: Dict[str, Dict[str, Any]]) -> None:
+        """Write to both tiers; Redis writes go out in one pipeline"""
+        if not values:
+            return
+        fresh_until = time.time() + self.redis_ttl
+        prefix = self.key_prefix(kind, brand_id)
+        keyed = [
+            (prefix + profile_id, {'value': value, 'fresh_until': fresh_until})
+            for profile_id, value in values.items()
+        ]
+        for key, envelope in keyed:
+            self.local.set(key, envelope)
+
+        if not self.redis:
+            return
+        try:
+            with timed_stage('cache_write', kind):
+                pipe = self.redis.pipeline(transaction=False)
+                for key, envelope in keyed:
+                    pipe.setex(key, self.redis_ttl + self.stale_ttl, json.dumps(envelope))
+                await pipe.execute()
+        except Exception:
+            pass  # Continue without caching
+
+    async def refresh_redis_stats(self) -> None:
+        """Update the Redis eviction gauge (called when metrics are scraped)"""
+        if not self.redis:
+            return
+        try:
+            info = await self.redis.info('stats')
+            REDIS_EVICTED_KEYS.set(info.get('evicted_keys', 0))
+        except Exception:
+            pass
@@ -0,0 +1,152 @@
+# GENERATOR: ML_PERFORMANCE
+# Pre-fork multi-worker server: models are loaded once and shared copy-on-write
+# HOW TO RUN: python -m api.prefork --workers 4 --port 8000
+#             (instead of uvicorn api.main:app --workers 4)
+# `uvicorn --workers N` starts N fresh interpreters that each import the app
+# and unpickle every model. Here the master imports api.main (loading all
+# artifacts), freezes the GC so the loaded objects are never written to by a
+# collection, binds the socket and forks the workers, which serve from the
+# master's pages until they write to them. Linux/macOS only (os.fork).
+#
+# Each worker still runs its own model watcher: a hot reload replaces the
+# shared model with a private copy in that worker only. Restart the server
+# after retraining to get the sharing back. Prometheus metrics are per worker.
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Dict
+
+ML_WORKERS = int(os.getenv("ML_WORKERS", str(os.cpu_count() or 1)))
+ML_SERVICE_PORT = int(os.getenv("ML_SERVICE_PORT", "8000"))
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Listening socket created in the master and inherited by every worker"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload_app():
+    """Import the app with every model loaded, then prepare the heap for forking"""
+    # Models must be loaded here, not lazily in each worker
+    os.environ["ML_LAZY_STARTUP"] = "false"
+
+    from api.main import app
+    from api import db
+
+    # Workers must open their own DB connections (the registry lookups
+    # above used the pool); a socket shared across processes corrupts both
+    db.close_pool()
+
+    if threading.active_count() > 1:
+        names = [thread.name for thread in threading.enumerate() if thread is not threading.main_thread()]
+        print(f"⚠️  Warning: threads running before fork will not exist in workers: {names}")
+
+    # Move everything allocated so far to the permanent generation: the
+    # cyclic GC in the workers then never touches (and copies) these pages
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def run_worker(app, sock: socket.socket, worker_id: int, log_level: str) -> None:
+    """Serve on the inherited socket until SIGTERM/SIGINT"""
+    import uvicorn
+
+    # Default dispositions again; uvicorn installs its own handlers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    print(f"Worker {worker_id} serving (pid {os.getpid()})")
+    server.run(sockets=[sock])
+
+
+class Master:
+    """Forks workers, restarts any that die and forwards shutdown signals"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, log_level: str):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.log_level = log_level
+        self.children: Dict[int, int] = {}  # pid -> worker id
+        self.stopping = False
+
+    def spawn(self, worker_id: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock, worker_id, self.log_level)
+            except BaseException as e:
+                print(f"Worker {worker_id} crashed: {e}")
+                code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        self.children[pid] = worker_id
+
+    def stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        os.environ["ML_PREFORK_MASTER_PID"] = str(os.getpid())
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            worker_id = self.children.pop(pid, None)
+            if worker_id is None or self.stopping:
+                continue
+            print(f"⚠️  Worker {worker_id} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(1)
+            self.spawn(worker_id)
+
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the ML API from pre-forked workers sharing loaded models")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=ML_SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=ML_WORKERS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print(f"Pre-fork ML service: {args.workers} workers on {args.host}:{args.port}")
+    print("=" * 50)
+
+    started = time.perf_counter()
+    app = preload_app()
+    print(f"Models loaded in the master in {time.perf_counter() - started:.2f}s")
+
+    sock = bind_socket(args.host, args.port)
+    Master(app, sock, args.workers, args.log_level).run()
@@ -0,0 +1,112 @@
+# GENERATOR: ML_PERFORMANCE
+# On-demand sampling profiler for a running worker
+# HOW TO USE: curl -X POST -H "X-Admin-Token: $ML_ADMIN_TOKEN" \
+#               "http://localhost:8000/admin/profile?seconds=10" > ml.collapsed
+#             flamegraph.pl ml.collapsed > ml.svg   (or drop the file on speedscope.app)
+# Samples every thread's Python stack with sys._current_frames() at a
+# fixed interval and returns collapsed stacks ("thread;outer;...;inner N").
+# The worker keeps serving while it runs; nothing is installed globally,
+# so there is no cost when no profile is being taken. Disabled unless
+# ML_ADMIN_TOKEN is set.
+
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+ML_ADMIN_TOKEN = os.getenv("ML_ADMIN_TOKEN", "")
+ML_PROFILE_MAX_SECONDS = float(os.getenv("ML_PROFILE_MAX_SECONDS", "60"))
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+class SamplingProfiler:
+    """Stack sampler; one profile at a time per process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, interval: float) -> Dict[str, int]:
+        """Sample all threads for `seconds`; returns collapsed stack -> sample count"""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            own_id = threading.get_ident()
+            samples: Counter = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    samples[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+                time.sleep(interval)
+            return dict(samples)
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.append(thread_name)
+        return ";".join(reversed(stack))
+
+
+def render_collapsed(samples: Dict[str, int]) -> str:
+    """Brendan Gregg collapsed format, heaviest stacks first"""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(samples.items(), key=lambda item: -item[1]))
+
+
+profiler = SamplingProfiler()
+
+
+def check_admin_token(token: Optional[str]) -> None:
+    if not ML_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (ML_ADMIN_TOKEN not set)")
+    if not token or not hmac.compare_digest(token, ML_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Sample this worker's Python stacks for `seconds` and return collapsed stacks
+    Requests keep being served meanwhile (the sampler runs on its own thread).
+    """
+    check_admin_token(x_admin_token)
+    if seconds > ML_PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be <= {ML_PROFILE_MAX_SECONDS}")
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    try:
+        samples = await asyncio.to_thread(profiler.run, seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return PlainTextResponse(
+        render_collapsed(samples),
+        headers={
+            'Content-Disposition': f'attachment; filename="ml-profile-{os.getpid()}-{int(time.time())}.collapsed"',
+            'X-Profile-Samples': str(sum(samples.values())),
+        },
+    )
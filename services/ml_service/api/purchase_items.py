@@ -0,0 +1,123 @@
+# GENERATOR: ML_PERFORMANCE
+# Product IDs of purchase events: the purchase_item projection and the payload rules behind it
+# HOW TO USE: cursor.execute(HISTORY_SQL if ML_PURCHASE_ITEM_TABLE else PAYLOAD_HISTORY_SQL, ...)
+#             product_ids = purchased_product_ids(event_payload)
+# purchase_item (migration 20251213000000_add_purchase_item) holds one row
+# per product of every purchase event, maintained by a trigger on
+# customer_raw_event, with indexes that make a profile's recent history an
+# index-only scan. The queries below return only profile/product ids; the
+# PAYLOAD_* variants read the raw payloads instead and are used with
+# ML_PURCHASE_ITEM_TABLE=false (e.g. before the migration is deployed).
+
+import json
+import os
+from typing import Any, List
+
+ML_PURCHASE_ITEM_TABLE = os.getenv("ML_PURCHASE_ITEM_TABLE", "true").lower() == "true"
+
+# Purchase events read per profile, most recent first
+HISTORY_EVENT_LIMIT = 100
+
+# Params: profile_id, brand_id, brand_id, event limit -> rows of product_id
+HISTORY_SQL = """
+    SELECT product_id
+    FROM (
+        SELECT product_id,
+               DENSE_RANK() OVER (ORDER BY created_at DESC, event_id) AS recency
+        FROM purchase_item
+        WHERE profile_id = %s
+        AND (brand_id = %s OR %s IS NULL)
+    ) recent
+    WHERE recency <= %s
+"""
+
+# Params: profile_ids, brand_id, brand_id, event limit -> rows of (profile_id, product_id)
+HISTORIES_SQL = """
+    SELECT profile_id, product_id
+    FROM (
+        SELECT profile_id, product_id,
+               DENSE_RANK() OVER (PARTITION BY profile_id ORDER BY created_at DESC, event_id) AS recency
+        FROM purchase_item
+        WHERE profile_id = ANY(%s)
+        AND (brand_id = %s OR %s IS NULL)
+    ) recent
+    WHERE recency <= %s
+"""
+
+# Params: brand_id, brand_id -> rows of (profile_id, product_id), each
+# profile's purchases in time order (item2vec training sequences)
+SEQUENCES_SQL = """
+    SELECT profile_id, product_id
+    FROM purchase_item
+    WHERE (brand_id = %s OR %s IS NULL)
+    AND profile_id IS NOT NULL
+    ORDER BY brand_id, profile_id, created_at, event_id, item_index
+"""
+
+# Same parameters as above; rows carry the payload instead of product_id
+PAYLOAD_HISTORY_SQL = """
+    SELECT payload
+    FROM customer_raw_event
+    WHERE event_type = 'purchase'
+    AND customer_profile_id = %s
+    AND (brand_id = %s OR %s IS NULL)
+    ORDER BY created_at DESC
+    LIMIT %s
+"""
+
+PAYLOAD_HISTORIES_SQL = """
+    SELECT customer_profile_id AS profile_id, payload
+    FROM (
+        SELECT customer_profile_id, payload,
+               ROW_NUMBER() OVER (PARTITION BY customer_profile_id ORDER BY created_at DESC) AS recency
+        FROM customer_raw_event
+        WHERE event_type = 'purchase'
+        AND customer_profile_id = ANY(%s)
+        AND (brand_id = %s OR %s IS NULL)
+    ) recent
+    WHERE recency <= %s
+"""
+
+PAYLOAD_SEQUENCES_SQL = """
+    SELECT customer_profile_id AS profile_id, payload
+    FROM customer_raw_event
+    WHERE event_type = 'purchase'
+    AND (brand_id = %s OR %s IS NULL)
+    AND customer_profile_id IS NOT NULL
+    ORDER BY customer_profile_id, created_at
+"""
+
+
+def purchased_product_ids(payload: Any) -> List[str]:
+    """
+    Product IDs of one purchase payload, in payload order
+
+    Same rules as purchase_payload_products() in the purchase_item migration:
+    items/line_items/products objects give product_id, else id, else sku;
+    products may also list plain strings; without any of these the
+    top-level product_id is used.
+    """
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return []
+    if not isinstance(payload, dict):
+        return []
+
+    product_ids = []
+    for key in ('items', 'line_items', 'products'):
+        items = payload.get(key)
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if isinstance(item, dict):
+                pid = item.get('product_id') or item.get('id') or item.get('sku')
+                if pid:
+                    product_ids.append(str(pid))
+            elif key == 'products' and isinstance(item, str) and item:
+                product_ids.append(item)
+
+    if not product_ids and payload.get('product_id'):
+        product_ids.append(str(payload['product_id']))
+    return product_ids
@@ -0,0 +1,154 @@
+# GENERATOR: ML_PERFORMANCE
+# Stampede protection for cold or expiring predictions
+# HOW TO USE: guard = StampedeGuard(redis_client)
+#             value = await guard.load(key, compute, read_cache)
+#             guard.revalidate(key, compute)   # stale-while-revalidate refresh
+# In one process concurrent callers for a key await a single computation;
+# across workers a short-lived Redis lease elects one worker to compute.
+
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+ML_LEASE_TTL_MS = int(os.getenv("ML_LEASE_TTL_MS", "5000"))
+# How long a worker that lost the lease waits for the winner's result
+ML_LEASE_WAIT_MS = int(os.getenv("ML_LEASE_WAIT_MS", "2000"))
+ML_LEASE_POLL_MS = int(os.getenv("ML_LEASE_POLL_MS", "50"))
+
+# Delete the lease only if we still own it
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """De-duplicates concurrent async computations per key (one event loop)"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        # A cancelled caller must not cancel the computation others are awaiting
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved when nobody awaits a background refresh
+            task.exception()
+
+
+class RedisLease:
+    """SET NX PX lease with token-checked release"""
+
+    def __init__(self, redis_client: Any, ttl_ms: int = ML_LEASE_TTL_MS):
+        self.redis = redis_client
+        self.ttl_ms = ttl_ms
+
+    async def acquire(self, key: str) -> Optional[str]:
+        """Lease token, or None if another worker holds the lease.
+        Without Redis every caller is its own leader."""
+        token = uuid.uuid4().hex
+        if not self.redis:
+            return token
+        try:
+            acquired = await self.redis.set(f"lease:{key}", token, nx=True, px=self.ttl_ms)
+        except Exception:
+            return token  # Redis trouble must not block predictions
+        return token if acquired else None
+
+    async def release(self, key: str, token: str) -> None:
+        if not self.redis:
+            return
+        try:
+            await self.redis.eval(_RELEASE_SCRIPT, 1, f"lease:{key}", token)
+        except Exception:
+            pass  # Lease expires on its own
+
+
+class StampedeGuard:
+    """Single-flight in process plus a Redis lease across workers"""
+
+    def __init__(
+        self,
+        redis_client: Any,
+        lease_ttl_ms: int = ML_LEASE_TTL_MS,
+        wait_ms: int = ML_LEASE_WAIT_MS,
+        poll_ms: int = ML_LEASE_POLL_MS,
+    ):
+        self.flights = SingleFlight()
+        self.lease = RedisLease(redis_client, lease_ttl_ms)
+        self.wait = wait_ms / 1000
+        self.poll = poll_ms / 1000
+
+    @property
+    def redis(self) -> Any:
+        return self.lease.redis
+
+    @redis.setter
+    def redis(self, client: Any) -> None:
+        self.lease.redis = client
+
+    async def load(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        read_cache: Callable[[], Awaitable[Optional[Any]]],
+    ) -> Any:
+        """
+        Compute a missing value once.
+
+        compute() must store its result in the shared cache; read_cache()
+        is polled by workers that lost the lease until the winner's value
+        appears, or they give up after ML_LEASE_WAIT_MS and compute anyway.
+        """
+        async def leader():
+            token = await self.lease.acquire(key)
+            if token is None:
+                deadline = time.monotonic() + self.wait
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(self.poll)
+                    value = await read_cache()
+                    if value is not None:
+                        return value
+                # Lease holder is slow or died - compute ourselves
+            try:
+                return await compute()
+            finally:
+                if token is not None:
+                    await self.lease.release(key, token)
+
+        return await self.flights.do(key, leader)
+
+    def revalidate(self, key: str, compute: Callable[[], Awaitable[Any]]) -> None:
+        """Refresh a stale value in the background; at most one refresh per key cluster-wide"""
+        if self.flights.in_flight(key):
+            return
+
+        async def refresh():
+            token = await self.lease.acquire(key)
+            if token is None:
+                return None  # Another worker is refreshing it
+            try:
+                return await compute()
+            except Exception as e:
+                print(f"Background refresh failed for {key}: {e}")
+                return None
+            finally:
+                await self.lease.release(key, token)
+
+        asyncio.ensure_future(self.flights.do(key, refresh))
@@ -0,0 +1,85 @@
+# GENERATOR: ML_PERFORMANCE
+# Startup timing and readiness tracking for the ML service
+# HOW TO USE: with startup.timed('import:model_loader'): from api import model_loader
+#             startup.load_in_background({'recommendations': load_recommendation_models})
+#             GET /ready returns startup.status() (503 until every loader finished)
+# ML_LAZY_STARTUP=true lets the app start serving /health immediately and
+# load model artifacts concurrently in the background; otherwise they are
+# loaded (still concurrently) before the app finishes importing.
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+ML_LAZY_STARTUP = os.getenv("ML_LAZY_STARTUP", "false").lower() == "true"
+
+
+class StartupTracker:
+    """Records import/load durations and whether model loading has finished"""
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self.timings: Dict[str, float] = {}
+        self.components: Dict[str, str] = {}  # name -> pending | loaded | failed
+        self.ready_after: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.timings[name] = round(time.perf_counter() - started, 4)
+
+    def load_all(self, loaders: Dict[str, Callable[[], Any]]) -> None:
+        """Run every loader concurrently on its own thread; returns when all finished"""
+        for name in loaders:
+            self.components[name] = 'pending'
+        if loaders:
+            with ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix="startup-load") as pool:
+                for name, loader in loaders.items():
+                    pool.submit(self._load, name, loader)
+        self.ready_after = round(time.perf_counter() - self._started, 4)
+        self._ready.set()
+        self.report()
+
+    def load_in_background(self, loaders: Dict[str, Callable[[], Any]]) -> threading.Thread:
+        thread = threading.Thread(target=self.load_all, args=(loaders,), name="startup-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def _load(self, name: str, loader: Callable[[], Any]) -> None:
+        try:
+            with self.timed(f"load:{name}"):
+                loader()
+            self.components[name] = 'loaded'
+        except Exception as e:
+            print(f"⚠️  Warning: Loading {name} failed: {e}")
+            self.components[name] = 'failed'
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'ready': self.ready,
+            'lazy_startup': ML_LAZY_STARTUP,
+            'ready_after_seconds': self.ready_after,
+            'components': dict(self.components),
+            'timings_seconds': dict(self.timings),
+        }
+
+    def report(self) -> None:
+        print(f"Startup ready after {self.ready_after:.2f}s")
+        for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1]):
+            print(f"  {name:<40} {seconds:8.3f}s")
+
+
+startup = StartupTracker()
@@ -0,0 +1,70 @@
+# GENERATOR: ML_PERFORMANCE
+# Per-request span tracing with a Server-Timing breakdown
+# HOW TO USE: with span('faiss_search'): ...          (no-op unless a trace is active)
+#             trace = start_trace(); ...; server_timing_header(trace)
+# Send the ML_TRACE_HEADER request header (default X-Debug-Timing: 1) to
+# get a Server-Timing response header for that request. Spans recorded on
+# run_db/run_inference threads land in the request's trace because the
+# executors copy the caller's context. api.metrics.timed_stage records a
+# span as well, so every instrumented stage shows up here too.
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ML_TRACE_ENABLED = os.getenv("ML_TRACE_ENABLED", "true").lower() == "true"
+ML_TRACE_HEADER = os.getenv("ML_TRACE_HEADER", "X-Debug-Timing")
+
+# (name, seconds) spans of the current request; None when not tracing
+_trace: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('ml_trace', default=None)
+
+
+def start_trace() -> List[Tuple[str, float]]:
+    """Begin collecting spans for the current request context"""
+    trace: List[Tuple[str, float]] = []
+    _trace.set(trace)
+    return trace
+
+
+def record(name: str, seconds: float) -> None:
+    """Add a finished span to the active trace, if any"""
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block as a span of the active trace; free when not tracing"""
+    if _trace.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def server_timing_header(trace: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """
+    Server-Timing value with spans of the same name summed, e.g.
+    'feature_fetch;dur=2.41, inference.churn;dur=0.35;desc="x3", total;dur=4.02'
+    """
+    totals: Dict[str, List[float]] = {}
+    for name, seconds in trace:
+        entry = totals.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    metrics = []
+    for name, (seconds, count) in totals.items():
+        metric = f"{name};dur={seconds * 1000:.2f}"
+        if count > 1:
+            metric += f';desc="x{count}"'
+        metrics.append(metric)
+    if total is not None:
+        metrics.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(metrics)
@@ -0,0 +1,316 @@
+# GENERATOR: ML_PERFORMANCE
+# Pure-NumPy inference for LightGBM tree ensembles (offline tool, not used for serving)
+# HOW TO USE: engine = CompiledTreeEnsemble.from_model(booster_or_lgbm_estimator)
+#             scores = engine.predict(X)   # same values as booster.predict(X)
+# Native Booster.predict is faster at every batch size measured by
+# benchmarks/bench_tree_engine.py (1 to 100k rows), so the service keeps
+# scoring with LightGBM. The engine is for scoring where lightgbm is not
+# installed and for checking a dumped model's structure.
+# The booster's dump_model() is compiled once into flat node arrays; a batch
+# is then scored by walking every (row, tree) pair one level per step.
+# Shallow trees without missing-value routing use a complete-binary-tree
+# (heap) layout where the next node is 2*i+1+went_right, so no child
+# lookups are needed; other models use explicit left/right arrays.
+
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# LightGBM's kZeroThreshold (1e-35f, widened to double): every input with
+# |x| <= this is read as 0.0, and zero-bin splits sit at +-this value
+_ZERO_THRESHOLD = float(np.float32(1e-35))
+
+_MISSING_NONE, _MISSING_ZERO, _MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {'None': _MISSING_NONE, 'Zero': _MISSING_ZERO, 'NaN': _MISSING_NAN}
+
+# Rows scored per traversal pass; bounds the (rows x trees) index matrix
+DEFAULT_CHUNK_ROWS = 8192
+# Deeper ensembles would pad every tree to 2**depth leaves; use the pointer layout
+MAX_HEAP_DEPTH = 12
+
+
+class UnsupportedModelError(ValueError):
+    """The booster uses a feature this engine does not implement"""
+
+
+class CompiledTreeEnsemble:
+    """
+    A LightGBM ensemble flattened into NumPy arrays.
+
+    Every node (internal or leaf) is one slot in the arrays. Leaves point
+    both children at themselves with an always-true split, so a fixed number
+    of traversal steps (the deepest tree's depth) lands every (row, tree)
+    pair on its leaf without per-node masking.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        default_left: np.ndarray,
+        missing_type: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        depth: int,
+        num_features: int,
+        transform: str = 'identity',
+        sigmoid: float = 1.0,
+        average_output: bool = False,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.missing_type = missing_type
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.num_features = num_features
+        self.transform = transform
+        self.sigmoid = sigmoid
+        self.average_output = average_output
+        self._needs_missing = bool(np.any(missing_type != _MISSING_NONE))
+        self._heap = self._build_heap() if (depth <= MAX_HEAP_DEPTH and not self._needs_missing) else None
+
+    def _build_heap(self) -> Dict[str, np.ndarray]:
+        """Pad every tree to full depth in heap order; padded leaves copy their ancestor leaf's value"""
+        n_trees, depth = len(self.roots), self.depth
+        n_internal, n_leaves = 2 ** depth - 1, 2 ** depth
+        feature = np.zeros((n_trees, n_internal), dtype=np.intp)
+        threshold = np.full((n_trees, n_internal), math.inf)
+        leaf_value = np.zeros((n_trees, n_leaves))
+
+        for t, root in enumerate(self.roots):
+            stack = [(int(root), 0, 0)]  # (node, heap position, level)
+            while stack:
+                node, pos, level = stack.pop()
+                if self.left[node] == node:
+                    first = last = pos
+                    for _ in range(depth - level):
+                        first, last = 2 * first + 1, 2 * last + 2
+                    leaf_value[t, first - n_internal:last - n_internal + 1] = self.value[node]
+                    continue
+                feature[t, pos] = self.feature[node]
+                threshold[t, pos] = self.threshold[node]
+                stack.append((int(self.left[node]), 2 * pos + 1, level + 1))
+                stack.append((int(self.right[node]), 2 * pos + 2, level + 1))
+
+        return {
+            'feature': feature.ravel(),
+            'threshold': threshold.ravel(),
+            'leaf_value': leaf_value.ravel(),
+            # Global heap index of each tree's root, and of its first leaf slot
+            'base': (np.arange(n_trees) * n_internal)[:, None],
+            'leaf_base': (np.arange(n_trees) * n_leaves - n_internal)[:, None],
+        }
+
+    @classmethod
+    def from_model(cls, model: Any) -> "CompiledTreeEnsemble":
+        """Compile a lightgbm.Booster or a fitted LGBMClassifier/LGBMRegressor"""
+        booster = getattr(model, 'booster_', model)
+        if not hasattr(booster, 'dump_model'):
+            raise UnsupportedModelError(f"{type(model).__name__} is not a LightGBM model")
+        return cls.from_dump(booster.dump_model())
+
+    @classmethod
+    def from_dump(cls, dump: Dict[str, Any]) -> "CompiledTreeEnsemble":
+        if dump.get('num_tree_per_iteration', 1) != 1:
+            raise UnsupportedModelError("Multiclass boosters are not supported")
+
+        nodes: Dict[str, List[Any]] = {
+            'feature': [], 'threshold': [], 'left': [], 'right': [],
+            'default_left': [], 'missing_type': [], 'value': [],
+        }
+        roots: List[int] = []
+        max_depth = 0
+
+        def add(node: Dict[str, Any], depth: int) -> int:
+            nonlocal max_depth
+            idx = len(nodes['feature'])
+            for column in nodes.values():
+                column.append(None)
+
+            if 'leaf_value' in node:
+                max_depth = max(max_depth, depth)
+                nodes['feature'][idx] = 0
+                nodes['threshold'][idx] = math.inf
+                nodes['left'][idx] = idx
+                nodes['right'][idx] = idx
+                nodes['default_left'][idx] = True
+                nodes['missing_type'][idx] = _MISSING_NONE
+                nodes['value'][idx] = node['leaf_value']
+                return idx
+
+            if node.get('decision_type', '<=') != '<=':
+                raise UnsupportedModelError("Categorical splits are not supported")
+            nodes['feature'][idx] = node['split_feature']
+            nodes['threshold'][idx] = node['threshold']
+            nodes['default_left'][idx] = node['default_left']
+            nodes['missing_type'][idx] = _MISSING_TYPES[node['missing_type']]
+            nodes['value'][idx] = 0.0
+            nodes['left'][idx] = add(node['left_child'], depth + 1)
+            nodes['right'][idx] = add(node['right_child'], depth + 1)
+            return idx
+
+        for tree in dump['tree_info']:
+            if tree.get('is_linear'):
+                raise UnsupportedModelError("Linear trees are not supported")
+            roots.append(add(tree['tree_structure'], 0))
+
+        transform, sigmoid = _parse_objective(dump.get('objective', 'regression'))
+        return cls(
+            feature=np.asarray(nodes['feature'], dtype=np.int32),
+            threshold=np.asarray(nodes['threshold'], dtype=np.float64),
+            left=np.asarray(nodes['left'], dtype=np.int32),
+            right=np.asarray(nodes['right'], dtype=np.int32),
+            default_left=np.asarray(nodes['default_left'], dtype=bool),
+            missing_type=np.asarray(nodes['missing_type'], dtype=np.int8),
+            value=np.asarray(nodes['value'], dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            depth=max_depth,
+            num_features=dump['max_feature_idx'] + 1,
+            transform=transform,
+            sigmoid=sigmoid,
+            average_output=bool(dump.get('average_output')),
+        )
+
+    def predict_raw(self, X: np.ndarray, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> np.ndarray:
+        """Sum of leaf values per row (LightGBM raw_score)"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.num_features:
+            raise ValueError(f"Expected a (n, {self.num_features}) matrix, got {X.shape}")
+        if X.shape[0] <= chunk_rows:
+            return self._raw_chunk(X)
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_rows):
+            out[start:start + chunk_rows] = self._raw_chunk(X[start:start + chunk_rows])
+        return out
+
+    def _raw_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_rows = X.shape[0]
+        # LightGBM zeroes near-zero inputs before traversal, for every split
+        X = np.where(np.abs(X) <= _ZERO_THRESHOLD, 0.0, X)
+        if not self._needs_missing and np.isnan(X).any():
+            # Every split has missing_type None: LightGBM reads NaN as 0.0
+            X = np.where(np.isnan(X), 0.0, X)
+        # Trees on axis 0, rows on axis 1: the final reduce then adds trees
+        # one after another, in LightGBM's order, for identical rounding
+        Xt = np.ascontiguousarray(X.T)
+        cols = np.arange(n_rows)[None, :]
+
+        if self._heap is not None:
+            heap = self._heap
+            node = np.broadcast_to(heap['base'], (len(self.roots), n_rows)).copy()
+            offset = heap['base'] - 1
+            for _ in range(self.depth):
+                went_right = Xt[heap['feature'][node], cols] > heap['threshold'][node]
+                # base + 2*(node - base) + 1 + went_right
+                node = 2 * node - offset + went_right
+            leaf_values = heap['leaf_value'][node - heap['base'] + heap['leaf_base']]
+        else:
+            node = np.broadcast_to(self.roots[:, None], (len(self.roots), n_rows)).copy()
+            for _ in range(self.depth):
+                fval = Xt[self.feature[node], cols]
+                if self._needs_missing:
+                    # Same rules as LightGBM's Tree::NumericalDecision
+                    missing_type = self.missing_type[node]
+                    is_nan = np.isnan(fval)
+                    fval = np.where(is_nan & (missing_type != _MISSING_NAN), 0.0, fval)
+                    is_missing = ((missing_type == _MISSING_ZERO) & (fval == 0.0)) | (
+                        (missing_type == _MISSING_NAN) & is_nan
+                    )
+                    go_left = np.where(is_missing, self.default_left[node], fval <= self.threshold[node])
+                else:
+                    go_left = fval <= self.threshold[node]
+                node = np.where(go_left, self.left[node], self.right[node])
+            leaf_values = self.value[node]
+
+        raw = np.add.reduce(leaf_values, axis=0)
+        if self.average_output and len(self.roots):
+            raw /= len(self.roots)
+        return raw
+
+    def predict(self, X: np.ndarray, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> np.ndarray:
+        """Transformed scores, matching Booster.predict (probabilities for binary)"""
+        raw = self.predict_raw(X, chunk_rows)
+        if self.transform == 'sigmoid':
+            return 1.0 / (1.0 + np.exp(-self.sigmoid * raw))
+        if self.transform == 'exp':
+            return np.exp(raw)
+        return raw
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """(n, 2) class probabilities, matching LGBMClassifier.predict_proba"""
+        p = self.predict(X)
+        return np.column_stack([1.0 - p, p])
+
+
+def _parse_objective(objective: str) -> tuple:
+    """(transform, sigmoid scale) for a LightGBM objective string such as 'binary sigmoid:1'"""
+    name, *params = objective.split()
+    if name in ('binary', 'cross_entropy', 'xentropy'):
+        sigmoid = 1.0
+        for param in params:
+            if param.startswith('sigmoid:'):
+                sigmoid = float(param.split(':', 1)[1])
+        return 'sigmoid', sigmoid
+    if name in ('poisson', 'gamma', 'tweedie'):
+        return 'exp', 1.0
+    if name in ('regression', 'regression_l1', 'huber', 'fair', 'quantile', 'mape'):
+        return 'identity', 1.0
+    raise UnsupportedModelError(f"Objective '{objective}' is not supported")
+
+
+def compile_model(
+    model: Any,
+    num_features: int,
+    sample_rows: int = 256,
+    atol: float = 1e-9,
+    seed: int = 0,
+) -> Optional[CompiledTreeEnsemble]:
+    """
+    Compile a LightGBM model and check it against native predict on random rows
+
+    Returns None (the caller keeps using the native model) if the model is
+    not LightGBM, uses an unsupported feature, or the outputs disagree; the
+    reason is printed.
+    """
+    try:
+        engine = CompiledTreeEnsemble.from_model(model)
+    except UnsupportedModelError as e:
+        print(f"Compiled tree engine rejected the model: {e}; using native model")
+        return None
+    if engine.num_features != num_features:
+        print(
+            f"Compiled tree engine rejected the model: it has {engine.num_features} features, "
+            f"expected {num_features}; using native model"
+        )
+        return None
+
+    rng = np.random.default_rng(seed)
+    # Mix of thresholds-scale values, zeros, values within LightGBM's zero
+    # threshold and exact threshold hits
+    X = rng.normal(0, 100, size=(sample_rows, num_features))
+    X[rng.random(X.shape) < 0.1] = 0.0
+    near_zero = rng.random(X.shape) < 0.05
+    X[near_zero] = rng.choice([-1.0, 1.0], size=int(near_zero.sum())) * _ZERO_THRESHOLD * rng.random(int(near_zero.sum()))
+    split_nodes = engine.feature[engine.left != np.arange(len(engine.left))]
+    split_thresholds = engine.threshold[engine.left != np.arange(len(engine.left))]
+    for j, (f, thr) in enumerate(zip(split_nodes[:sample_rows], split_thresholds[:sample_rows])):
+        X[j, f] = thr
+
+    booster = getattr(model, 'booster_', model)
+    expected = booster.predict(X)
+    diff = np.abs(engine.predict(X) - expected)
+    if not np.all(diff <= atol):
+        row = int(np.argmax(diff))
+        print(
+            f"Compiled tree engine rejected the model: max |diff| {diff[row]:.3g} vs native predict "
+            f"(atol {atol:g}) on sample row {row}; using native model"
+        )
+        return None
+    return engine
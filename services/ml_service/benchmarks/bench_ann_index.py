@@ -0,0 +1,92 @@
+# GENERATOR: ML_PERFORMANCE
+# recall@k vs. search latency of the FAISS index types in api/ann_index.py
+# HOW TO RUN:
+#   Synthetic catalog:  python benchmarks/bench_ann_index.py --synthetic 500000 --dimension 64
+#   Trained catalog:    python benchmarks/bench_ann_index.py --index models/recommendations_<version>/index.faiss
+#   --index takes a flat index written by train_recommendations.py; its
+#   vectors are reconstructed and every index type is rebuilt from them.
+#   Synthetic vectors are drawn around --clusters centres, like item2vec
+#   embeddings of products bought together.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.ann_index import (
+    INDEX_TYPES, build_index, format_report, index_bytes, recall_report, sample_queries,
+)
+
+
+def synthetic_vectors(count: int, dimension: int, clusters: int, spread: float, seed: int = 0) -> np.ndarray:
+    import faiss
+
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimension)).astype('float32')
+    vectors = centres[rng.integers(0, clusters, count)] + spread * rng.normal(size=(count, dimension)).astype('float32')
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def index_vectors(path: str) -> np.ndarray:
+    import faiss
+
+    index = faiss.read_index(path)
+    if not isinstance(index, faiss.IndexFlat):
+        raise SystemExit(f"{path} is a {type(index).__name__}; vectors can only be read back from a flat index")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS index types: recall@k vs. latency against exact search")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, metavar="N", help="Number of synthetic product vectors")
+    source.add_argument("--index", help="Flat FAISS index written by train_recommendations.py")
+    parser.add_argument("--dimension", type=int, default=64)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--spread", type=float, default=0.3)
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--pq-m", type=int)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.index:
+        vectors = index_vectors(args.index)
+    else:
+        vectors = synthetic_vectors(args.synthetic, args.dimension, args.clusters, args.spread)
+    queries = sample_queries(vectors, count=args.queries)
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, {len(queries)} queries, k={args.k}")
+
+    results = []
+    for index_type in args.types:
+        started = time.perf_counter()
+        index = build_index(
+            vectors, index_type,
+            nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m, ef_construction=args.ef_construction,
+        )
+        build_seconds = time.perf_counter() - started
+        rows = recall_report(index, vectors, k=args.k, queries=queries)
+        size = index_bytes(index)
+        print(f"\n{index_type}: built in {build_seconds:.2f}s, {size / 1e6:.1f} MB")
+        print(format_report(rows))
+        results.append({
+            'index_type': index_type,
+            'build_seconds': round(build_seconds, 2),
+            'index_bytes': size,
+            'rows': rows,
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
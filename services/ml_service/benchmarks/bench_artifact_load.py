@@ -0,0 +1,151 @@
+# GENERATOR: ML_PERFORMANCE
+# Load time of pickled model bundles vs. manifest artifacts (api/artifacts.py)
+# HOW TO RUN:
+#   Trained models:   python benchmarks/bench_artifact_load.py --pickle models/churn_<version>.pkl models/segmentation_<version>.pkl
+#   Synthetic model:  python benchmarks/bench_artifact_load.py --synthetic --trees 1000 --leaves 63
+#   Every pickle is converted into a temporary directory first; predictions
+#   of both forms are compared on random rows. "cold" is one load in a fresh
+#   interpreter, including the imports it triggers (e.g. sklearn for KMeans).
+
+import argparse
+import json
+import os
+import pickle
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+from api.artifacts import artifact_size, convert_pickle, load_artifact_bundle
+
+
+def time_load(fn: Callable[[], Any], runs: int) -> Dict[str, float]:
+    """Median and max wall time (ms) of repeated loads"""
+    samples: List[float] = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {
+        'runs': runs,
+        'p50_ms': round(statistics.median(samples), 3),
+        'max_ms': round(max(samples), 3),
+    }
+
+
+def time_cold(load_statement: str, runs: int) -> Dict[str, float]:
+    """Median wall time (ms) of imports + one load in a fresh interpreter"""
+    script = (
+        "import sys, time; sys.path.insert(0, %r); started = time.perf_counter(); %s; "
+        "print((time.perf_counter() - started) * 1000)"
+    ) % (SERVICE_DIR, load_statement)
+    samples = [
+        float(subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout.split()[-1])
+        for _ in range(runs)
+    ]
+    return {'runs': runs, 'p50_ms': round(statistics.median(samples), 3)}
+
+
+def load_pickle(path: str) -> Any:
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def predictions(bundle: Dict[str, Any], X: np.ndarray) -> np.ndarray:
+    model = bundle['model']
+    if 'scaler' in bundle:
+        return model.predict(bundle['scaler'].transform(X))
+    if hasattr(model, 'predict_proba'):
+        return model.predict_proba(X)[:, 1]
+    return model.predict(X)
+
+
+def synthetic_pickle(directory: str, trees: int, leaves: int, features: int) -> str:
+    """Train a throwaway churn-style model and pickle it like train_models.py"""
+    import lightgbm as lgb
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(50000, features))
+    y = (X[:, 0] + 0.5 * X[:, 1] + rng.normal(size=len(X)) > 0).astype(int)
+    booster = lgb.train(
+        {'objective': 'binary', 'num_leaves': leaves, 'verbose': -1},
+        lgb.Dataset(X, y),
+        num_boost_round=trees,
+    )
+    path = os.path.join(directory, 'churn_synthetic.pkl')
+    with open(path, 'wb') as f:
+        pickle.dump({
+            'model': booster,
+            'feature_cols': [f"f{i}" for i in range(features)],
+            'version': 'synthetic',
+        }, f)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pickle vs. manifest artifact load time")
+    parser.add_argument("--pickle", nargs="+", default=[], help="Pickled bundles written by the training scripts")
+    parser.add_argument("--synthetic", action="store_true", help="Also benchmark a synthetic LightGBM model")
+    parser.add_argument("--trees", type=int, default=500)
+    parser.add_argument("--leaves", type=int, default=63)
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--cold-runs", type=int, default=3, help="Fresh-interpreter loads per form (0 to skip)")
+    args = parser.parse_args()
+    if not args.pickle and not args.synthetic:
+        parser.error("pass --pickle and/or --synthetic")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        pickles = list(args.pickle)
+        if args.synthetic:
+            pickles.append(synthetic_pickle(workdir, args.trees, args.leaves, args.features))
+
+        for pickle_path in pickles:
+            name = os.path.basename(pickle_path)[:-len('.pkl')]
+            manifest_path = convert_pickle(pickle_path, os.path.join(workdir, name))
+
+            original = load_pickle(pickle_path)
+            converted = load_artifact_bundle(manifest_path)
+            X = np.random.default_rng(1).normal(0, 50, size=(1000, len(original['feature_cols'])))
+            expected, actual = predictions(original, X), predictions(converted, X)
+            if expected.dtype.kind == 'f':
+                agreement = {'max_abs_diff': float(np.max(np.abs(expected - actual)))}
+            else:
+                agreement = {'mismatches': int(np.sum(expected != actual))}
+
+            row = {
+                'artifact': name,
+                'pickle_bytes': os.path.getsize(pickle_path),
+                'artifact_bytes': artifact_size(manifest_path),
+                'pickle': time_load(lambda: load_pickle(pickle_path), args.runs),
+                'artifact_verified': time_load(lambda: load_artifact_bundle(manifest_path), args.runs),
+                'artifact_unverified': time_load(lambda: load_artifact_bundle(manifest_path, verify=False), args.runs),
+                **agreement,
+            }
+            if args.cold_runs:
+                row['pickle_cold'] = time_cold(
+                    f"import pickle; pickle.load(open({pickle_path!r}, 'rb'))", args.cold_runs)
+                row['artifact_cold'] = time_cold(
+                    f"from api.artifacts import load_artifact_bundle; load_artifact_bundle({manifest_path!r})", args.cold_runs)
+            results.append(row)
+            print(
+                f"{name:<32} pickle p50={row['pickle']['p50_ms']:>9.3f}ms  "
+                f"artifact p50={row['artifact_verified']['p50_ms']:>9.3f}ms "
+                f"(unverified {row['artifact_unverified']['p50_ms']:.3f}ms)  {agreement}"
+            )
+            if args.cold_runs:
+                print(f"{'':<32} cold: pickle p50={row['pickle_cold']['p50_ms']:>9.3f}ms  artifact p50={row['artifact_cold']['p50_ms']:>9.3f}ms")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
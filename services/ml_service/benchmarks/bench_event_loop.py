@@ -0,0 +1,141 @@
+# GENERATOR: ML_PERFORMANCE
+# Latency under concurrent load: blocking calls on the event loop vs. offloaded to thread pools
+# HOW TO RUN:
+#   Simulated (no DB needed):  python benchmarks/bench_event_loop.py --simulate
+#   Live service:              python benchmarks/bench_event_loop.py --url http://localhost:8000 --endpoint /predict/all
+#   For a before/after comparison against a live service, run the --url mode
+#   against a build from before the executor change and again against this one.
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        'count': len(ordered),
+        'p50_ms': round(pick(0.50), 2),
+        'p95_ms': round(pick(0.95), 2),
+        'p99_ms': round(pick(0.99), 2),
+        'max_ms': round(ordered[-1], 2),
+        'mean_ms': round(statistics.mean(ordered), 2),
+    }
+
+
+def _blocking_query(db_ms: float):
+    # Stands in for a psycopg2 round trip: releases the GIL but blocks its thread
+    time.sleep(db_ms / 1000)
+
+
+def _cpu_inference(rows: int = 2000):
+    import numpy as np
+    X = np.random.rand(rows, 6)
+    return float((X @ X.T).sum())
+
+
+async def _simulated_load(mode: str, concurrency: int, requests_per_worker: int, db_ms: float) -> Dict[str, Dict[str, float]]:
+    from api.executors import run_db, run_inference
+
+    slow_latencies: List[float] = []
+    fast_latencies: List[float] = []
+
+    async def slow_request():
+        start = time.perf_counter()
+        if mode == 'blocking':
+            _blocking_query(db_ms)
+            _cpu_inference()
+        else:
+            await run_db(_blocking_query, db_ms)
+            await run_inference(_cpu_inference)
+        slow_latencies.append((time.perf_counter() - start) * 1000)
+
+    async def fast_request():
+        # e.g. a cache hit: should take microseconds unless the loop is stalled
+        start = time.perf_counter()
+        await asyncio.sleep(0)
+        fast_latencies.append((time.perf_counter() - start) * 1000)
+
+    async def worker():
+        for _ in range(requests_per_worker):
+            await asyncio.gather(slow_request(), fast_request())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    total = concurrency * requests_per_worker
+    return {
+        'throughput_rps': round(total / elapsed, 1),
+        'slow_requests': percentiles(slow_latencies),
+        'fast_requests': percentiles(fast_latencies),
+    }
+
+
+def run_simulation(args):
+    results = {}
+    for mode in ('blocking', 'offloaded'):
+        results[mode] = asyncio.run(
+            _simulated_load(mode, args.concurrency, args.requests // args.concurrency or 1, args.db_ms)
+        )
+    print(json.dumps(results, indent=2))
+
+
+def run_http(args):
+    import requests
+
+    session = requests.Session()
+    payload = {'profile_id': args.profile_id, 'brand_id': args.brand_id}
+    latencies: List[float] = []
+    errors = 0
+
+    def one_request(_):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{args.url}{args.endpoint}", json=payload, timeout=30)
+            if response.status_code >= 500:
+                errors += 1
+        except Exception:
+            errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        'endpoint': args.endpoint,
+        'concurrency': args.concurrency,
+        'throughput_rps': round(args.requests / elapsed, 1),
+        'errors': errors,
+        'latency': percentiles(latencies),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Event-loop latency benchmark')
+    parser.add_argument('--simulate', action='store_true', help='Run the in-process simulation (no service needed)')
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--endpoint', default='/predict/all')
+    parser.add_argument('--profile-id', default='benchmark-profile')
+    parser.add_argument('--brand-id')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--db-ms', type=float, default=20.0, help='Simulated query latency')
+    args = parser.parse_args()
+
+    if args.simulate:
+        run_simulation(args)
+    else:
+        run_http(args)
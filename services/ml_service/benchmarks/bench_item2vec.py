@@ -0,0 +1,103 @@
+# GENERATOR: ML_PERFORMANCE
+# item2vec training throughput: in-memory sentences vs. corpus file, per worker count
+# HOW TO RUN:
+#   python benchmarks/bench_item2vec.py --sequences 200000 --products 50000 --workers 1 2 4 8
+#   Synthetic purchase sequences (Zipf-distributed products, 2..--max-length
+#   items) are written with train_recommendations.write_sequence_corpus, then
+#   trained with the same Word2Vec settings as training:
+#     sentences    train_item2vec on Python lists (the default mode)
+#     corpus_file  train_item2vec_corpus_file (--streaming)
+#   Reports effective words/s (corpus words x epochs / training time) and the
+#   speedup over one worker. Worker counts above the core count are skipped.
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from train.train_recommendations import (
+    GENSIM_AVAILABLE, item2vec_params, train_item2vec, train_item2vec_corpus_file, write_sequence_corpus,
+)
+
+
+def synthetic_sequences(count: int, products: int, max_length: int, zipf: float, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(2, max_length + 1, count)
+    ranks = (rng.zipf(zipf, int(lengths.sum())) - 1) % products
+    items = [f"sku_{rank}" for rank in ranks]
+    sequences, start = [], 0
+    for length in lengths:
+        sequences.append(items[start:start + length])
+        start += length
+    return sequences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="item2vec training throughput: sentences vs. corpus_file")
+    parser.add_argument("--sequences", type=int, default=200000)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--max-length", type=int, default=30)
+    parser.add_argument("--zipf", type=float, default=1.3)
+    parser.add_argument("--vector-size", type=int, default=64)
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--modes", nargs="+", choices=("sentences", "corpus_file"), default=["sentences", "corpus_file"])
+    args = parser.parse_args()
+
+    if not GENSIM_AVAILABLE:
+        raise SystemExit("gensim is required. Install with: pip install gensim")
+
+    cores = os.cpu_count() or 1
+    workers = [w for w in args.workers if w <= cores]
+    skipped = [w for w in args.workers if w > cores]
+    if skipped:
+        print(f"Skipping workers {skipped}: only {cores} core(s) available")
+
+    sequences = synthetic_sequences(args.sequences, args.products, args.max_length, args.zipf)
+    epochs = item2vec_params(args.vector_size, args.window, 1)['epochs']
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus_path = os.path.join(workdir, 'corpus.txt')
+        started = time.perf_counter()
+        corpus = write_sequence_corpus(sequences, corpus_path)
+        write_seconds = time.perf_counter() - started
+        print(
+            f"{corpus['sequences']} sequences, {corpus['words']} words, {len(corpus['products'])} products; "
+            f"corpus written in {write_seconds:.2f}s ({os.path.getsize(corpus_path) / 1e6:.1f} MB)"
+        )
+
+        for mode in args.modes:
+            for worker_count in workers:
+                started = time.perf_counter()
+                if mode == 'sentences':
+                    model = train_item2vec(sequences, args.vector_size, args.window, workers=worker_count)
+                else:
+                    model = train_item2vec_corpus_file(corpus_path, corpus, args.vector_size, args.window, workers=worker_count)
+                seconds = time.perf_counter() - started
+                results.append({
+                    'mode': mode,
+                    'workers': worker_count,
+                    'seconds': round(seconds, 2),
+                    'words_per_second': round(corpus['words'] * epochs / seconds),
+                    'vocabulary': len(model.wv),
+                })
+
+    print(f"\n{'mode':<12} {'workers':>7} {'seconds':>8} {'words/s':>11} {'speedup':>8}")
+    for row in results:
+        single = next((r for r in results if r['mode'] == row['mode'] and r['workers'] == 1), None)
+        row['speedup'] = round(row['words_per_second'] / single['words_per_second'], 2) if single else None
+        print(
+            f"{row['mode']:<12} {row['workers']:>7} {row['seconds']:>8.2f} {row['words_per_second']:>11,} "
+            f"{row['speedup'] if row['speedup'] is not None else '-':>8}"
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
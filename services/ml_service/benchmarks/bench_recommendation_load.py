@@ -0,0 +1,154 @@
+# GENERATOR: ML_PERFORMANCE
+# Startup time and RSS of loading the recommendation model for serving
+# HOW TO RUN:
+#   Synthetic catalog:  python benchmarks/bench_recommendation_load.py --synthetic 500000 --dimension 64
+#   Trained model:      python benchmarks/bench_recommendation_load.py --model-path models
+#   Each form is loaded by api.recommendation_engine in a fresh interpreter:
+#     slim     manifest artifact with exported vectors (float32 and float16)
+#     gensim   pickle + full Word2Vec model as written before the export
+#              (synthetic only, and only where gensim imports)
+#   "rss_after_search" is after one recommendation lookup per --touch queries;
+#   memory-mapped vectors only count towards RSS once they are read.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+# Runs in the child: ML_MODEL_PATH points at a directory holding one model
+CHILD = r"""
+import json, os, sys, time
+sys.path.insert(0, %(service_dir)r)
+
+def rss():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+
+import numpy as np
+baseline = rss()
+started = time.perf_counter()
+from api import recommendation_engine as engine
+loaded = engine.load_recommendation_models()
+load_ms = (time.perf_counter() - started) * 1000
+after_load = rss()
+
+models = engine._recommendation_models
+embeddings = models['embeddings']
+rng = np.random.default_rng(0)
+for _ in range(%(touch)d):
+    items = [embeddings.index_to_key[i] for i in rng.integers(0, len(embeddings), 5)]
+    vector = embeddings.mean_vector(items)
+    models['faiss_index'].search(vector / np.linalg.norm(vector), 20)
+
+print(json.dumps({
+    'loaded': loaded,
+    'load_ms': round(load_ms, 1),
+    'rss_load_bytes': after_load - baseline,
+    'rss_after_search_bytes': rss() - baseline,
+    'gensim_imported': 'gensim' in sys.modules,
+}))
+"""
+
+
+def write_slim(directory: str, products, vectors: np.ndarray, dtype: str) -> None:
+    import faiss
+    from api.artifacts import ItemEmbeddings, save_recommendation_artifact
+
+    normalized = vectors.copy()
+    faiss.normalize_L2(normalized)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(normalized)
+    popularity = np.arange(len(products), dtype=np.int32)
+    embeddings = ItemEmbeddings(products, vectors.astype(dtype), popularity)
+    save_recommendation_artifact(os.path.join(directory, 'recommendations_bench'), 'bench', embeddings, index, vectors.shape[1])
+
+
+def write_gensim(directory: str, products, vectors: np.ndarray) -> bool:
+    """Pickle + Word2Vec model laid out like train_recommendations.py before the export"""
+    try:
+        from gensim.models import Word2Vec
+    except ImportError as e:
+        print(f"gensim form skipped: {e}")
+        return False
+    import faiss
+    import pickle
+
+    model = Word2Vec(vector_size=vectors.shape[1], min_count=1, sg=1)
+    # Every product occurs once, so the vocabulary keeps the products' order
+    model.build_vocab([products])
+    model.wv.vectors[:] = vectors
+    model.save(os.path.join(directory, 'item2vec_bench.model'), sep_limit=0)
+    normalized = model.wv.vectors.copy()
+    faiss.normalize_L2(normalized)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(normalized)
+    faiss.write_index(index, os.path.join(directory, 'faiss_index_bench.index'))
+    with open(os.path.join(directory, 'recommendations_metadata_bench.pkl'), 'wb') as f:
+        pickle.dump({
+            'product_to_idx': {pid: idx for idx, pid in enumerate(model.wv.index_to_key)},
+            'vector_size': vectors.shape[1],
+            'item2vec_path': os.path.join(directory, 'item2vec_bench.model'),
+            'faiss_path': os.path.join(directory, 'faiss_index_bench.index'),
+            'version': 'bench',
+            'num_products': len(products),
+        }, f)
+    return True
+
+
+def measure(model_path: str, touch: int, runs: int):
+    env = dict(os.environ, ML_MODEL_PATH=model_path)
+    script = CHILD % {'service_dir': SERVICE_DIR, 'touch': touch}
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    best = min(results, key=lambda row: row['load_ms'])
+    return {**best, 'load_ms_runs': [row['load_ms'] for row in results]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommendation model load time and RSS")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, metavar="N", help="Number of synthetic products")
+    source.add_argument("--model-path", help="Directory with a trained recommendation model")
+    parser.add_argument("--dimension", type=int, default=64)
+    parser.add_argument("--touch", type=int, default=1000, help="Lookups after loading")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    if args.model_path:
+        results['model'] = measure(args.model_path, args.touch, args.runs)
+    else:
+        rng = np.random.default_rng(0)
+        products = [f"sku_{i}" for i in range(args.synthetic)]
+        vectors = rng.normal(size=(args.synthetic, args.dimension)).astype('float32')
+        with tempfile.TemporaryDirectory() as workdir:
+            for dtype in ('float32', 'float16'):
+                directory = os.path.join(workdir, f"slim_{dtype}")
+                write_slim(directory, products, vectors, dtype)
+                results[f"slim_{dtype}"] = measure(directory, args.touch, args.runs)
+            directory = os.path.join(workdir, 'gensim')
+            os.makedirs(directory)
+            if write_gensim(directory, products, vectors):
+                results['gensim'] = measure(directory, args.touch, args.runs)
+
+    for name, row in results.items():
+        print(
+            f"{name:<14} load {row['load_ms']:>8.1f}ms  RSS +{row['rss_load_bytes'] / 1e6:>7.1f}MB "
+            f"(+{row['rss_after_search_bytes'] / 1e6:.1f}MB after lookups)  gensim imported: {row['gensim_imported']}"
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
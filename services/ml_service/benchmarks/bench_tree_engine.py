@@ -0,0 +1,101 @@
+# GENERATOR: ML_PERFORMANCE
+# Latency of the compiled NumPy tree engine vs. native LightGBM predict
+# HOW TO RUN:
+#   Trained models:   python benchmarks/bench_tree_engine.py --model models/churn_<version>.pkl
+#   Synthetic model:  python benchmarks/bench_tree_engine.py --synthetic --trees 100 --leaves 31
+#   Batch sizes default to 1,10,100,1000,10000,100000 rows.
+
+import argparse
+import json
+import os
+import pickle
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.tree_engine import CompiledTreeEnsemble
+
+
+def time_call(fn: Callable[[], Any], min_seconds: float = 0.2, min_runs: int = 5) -> Dict[str, float]:
+    """Median and p99 wall time (ms) of repeated calls"""
+    samples: List[float] = []
+    started = time.perf_counter()
+    while len(samples) < min_runs or time.perf_counter() - started < min_seconds:
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'p50_ms': round(statistics.median(ordered), 4),
+        'p99_ms': round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))], 4),
+    }
+
+
+def load_booster(args) -> Any:
+    if args.model:
+        with open(args.model, 'rb') as f:
+            model_data = pickle.load(f)
+        return model_data['model'] if isinstance(model_data, dict) else model_data
+
+    import lightgbm as lgb
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(20000, args.features))
+    y = (X[:, 0] + 0.5 * X[:, 1] + rng.normal(size=len(X)) > 0).astype(int)
+    return lgb.train(
+        {'objective': 'binary', 'num_leaves': args.leaves, 'verbose': -1},
+        lgb.Dataset(X, y),
+        num_boost_round=args.trees,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiled tree engine vs. LightGBM predict")
+    parser.add_argument("--model", help="Pickled model bundle ({'model': Booster, ...}) or bare LightGBM model")
+    parser.add_argument("--synthetic", action="store_true", help="Train a throwaway binary model instead")
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--leaves", type=int, default=31)
+    parser.add_argument("--features", type=int, default=6)
+    parser.add_argument("--batch-sizes", default="1,10,100,1000,10000,100000")
+    args = parser.parse_args()
+    if not args.model and not args.synthetic:
+        parser.error("pass --model or --synthetic")
+
+    model = load_booster(args)
+    booster = getattr(model, 'booster_', model)
+
+    t0 = time.perf_counter()
+    engine = CompiledTreeEnsemble.from_model(model)
+    compile_ms = (time.perf_counter() - t0) * 1000
+    print(f"Compiled {len(engine.roots)} trees ({len(engine.value)} nodes, depth {engine.depth}) in {compile_ms:.1f}ms")
+
+    rng = np.random.default_rng(1)
+    results = []
+    for batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+        X = rng.normal(0, 50, size=(batch_size, engine.num_features))
+        max_abs_diff = float(np.max(np.abs(engine.predict(X) - booster.predict(X))))
+        native = time_call(lambda: booster.predict(X))
+        compiled = time_call(lambda: engine.predict(X))
+        results.append({
+            'batch_size': batch_size,
+            'native': native,
+            'compiled': compiled,
+            'speedup_p50': round(native['p50_ms'] / compiled['p50_ms'], 2) if compiled['p50_ms'] else None,
+            'max_abs_diff': max_abs_diff,
+        })
+        print(
+            f"batch={batch_size:>7}  native p50={native['p50_ms']:>9.3f}ms  "
+            f"compiled p50={compiled['p50_ms']:>9.3f}ms  "
+            f"speedup={results[-1]['speedup_p50']:>6}x  max|diff|={max_abs_diff:.2e}"
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
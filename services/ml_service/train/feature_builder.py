@@ -13,6 +13,10 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.feature_store import FEATURE_SCHEMA, FEATURE_SCHEMA_VERSION, pack_features, split_features
+
 load_dotenv()
 
 def get_db_connection():
@@ -177,12 +181,36 @@ def build_features_for_profile(profile_id: str, brand_id: Optional[str] = None)
         conn.close()
 
 def save_features_to_db(profile_id: str, features: Dict[str, Any]):
-    """Save features to the features table"""
+    """
+    Save features to the online feature store
+    
+    Numeric features go into one packed profile_feature_vector row (read
+    by serving with a single primary-key lookup); dict-valued features such
+    as category_affinity stay in the features table.
+    """
+    vector_features, side_features = split_features(features)
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        for feature_name, feature_value in features.items():
+        cursor.execute(
+            """
+            INSERT INTO profile_feature_vector (profile_id, schema_version, vector, updated_at)
+            VALUES (%s, %s, %s, NOW())
+            ON CONFLICT (profile_id)
+            DO UPDATE SET schema_version = EXCLUDED.schema_version, vector = EXCLUDED.vector, updated_at = NOW()
+            """,
+            [profile_id, FEATURE_SCHEMA_VERSION, psycopg2.Binary(pack_features(vector_features))]
+        )
+        
+        # Numeric features now live in the vector only
+        cursor.execute(
+            "DELETE FROM features WHERE profile_id = %s AND feature_name = ANY(%s)",
+            [profile_id, FEATURE_SCHEMA]
+        )
+        
+        for feature_name, feature_value in side_features.items():
             # Generate UUID in Python
             feature_id = str(uuid.uuid4())
             
@@ -26,6 +26,11 @@ from sklearn.metrics import (
 import lightgbm as lgb
 import xgboost as xgb
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.artifacts import ML_ARTIFACT_FORMAT, save_artifact
+from api.feature_store import unpack_features
+
 load_dotenv()
 
 MODEL_PATH = os.getenv("ML_MODEL_PATH", "./models")
@@ -50,41 +55,42 @@ def save_model_version(
     feature_count: int,
     hyperparameters: Optional[Dict] = None,
     notes: Optional[str] = None,
-    is_active: bool = False
+    is_active: bool = False,
+    brand_id: Optional[str] = None
 ):
-    """Save model version metadata to database"""
+    """Save model version metadata to database (brand_id None = shared model)"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Deactivate previous versions of this model type if this one is active
+        # Deactivate previous versions of this model type (for the same brand) if this one is active
         if is_active:
             cursor.execute("""
                 UPDATE model_version 
                 SET is_active = false 
-                WHERE model_type = %s AND is_active = true
-            """, [model_type])
+                WHERE model_type = %s AND brand_id IS NOT DISTINCT FROM %s AND is_active = true
+            """, [model_type, brand_id])
         
         model_id = str(uuid.uuid4())
         cursor.execute("""
             INSERT INTO model_version 
-            (id, model_type, version, model_path, metrics, training_date, is_active, 
+            (id, model_type, brand_id, version, model_path, metrics, training_date, is_active, 
              training_samples, feature_count, hyperparameters, notes, created_at, updated_at)
-            VALUES (%s, %s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s, NOW(), NOW())
+            VALUES (%s, %s, %s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s, NOW(), NOW())
             ON CONFLICT (model_type, version) 
             DO UPDATE SET 
                 metrics = EXCLUDED.metrics,
                 is_active = EXCLUDED.is_active,
                 updated_at = NOW()
         """, [
-            model_id, model_type, version, model_path, json.dumps(metrics),
+            model_id, model_type, brand_id, version, model_path, json.dumps(metrics),
             is_active, training_samples, feature_count,
             json.dumps(hyperparameters) if hyperparameters else None,
             notes
         ])
         
         conn.commit()
-        print(f"✅ Saved model version: {model_type} v{version}")
+        print(f"✅ Saved model version: {model_type} v{version}" + (f" (brand {brand_id})" if brand_id else ""))
     except Exception as e:
         conn.rollback()
         print(f"⚠️  Error saving model version: {e}")
@@ -92,13 +98,50 @@ def save_model_version(
         cursor.close()
         conn.close()
 
+def new_model_version(brand_id: Optional[str] = None) -> str:
+    """Timestamp version; brand models get a brand suffix so versions stay unique per model type"""
+    version = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    return f"{version}_{brand_id[:8]}" if brand_id else version
+
+def save_model_artifact(
+    model_type: str,
+    bundle: Dict[str, Any],
+    metrics: Dict[str, Any],
+    hyperparameters: Dict[str, Any],
+    training_samples: int
+) -> str:
+    """
+    Write a trained bundle; returns the path to register in model_version
+    
+    ML_ARTIFACT_FORMAT=manifest (default) writes a checksummed artifact
+    directory (see api/artifacts.py) and returns its manifest.json;
+    "pickle" writes the bundle as a single .pkl. Brand models live under
+    MODEL_PATH/brands/<brand_id>/ so the shared model's newest-file
+    fallback in api.model_loader never picks them up.
+    """
+    brand_id = bundle.get('brand_id')
+    directory = os.path.join(MODEL_PATH, 'brands', brand_id) if brand_id else MODEL_PATH
+    name = f"{model_type}_{bundle['version']}"
+    if ML_ARTIFACT_FORMAT == 'manifest':
+        return save_artifact(os.path.join(directory, name), model_type, bundle, training={
+            'metrics': metrics,
+            'hyperparameters': hyperparameters,
+            'training_samples': training_samples,
+            'trained_at': datetime.utcnow().isoformat(),
+        })
+    os.makedirs(directory, exist_ok=True)
+    model_file = os.path.join(directory, f"{name}.pkl")
+    with open(model_file, 'wb') as f:
+        pickle.dump(bundle, f)
+    return model_file
+
 def load_training_data(brand_id: Optional[str] = None) -> pd.DataFrame:
     """Load profiles with features and labels for training"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Get all profiles with features
+        # Get all profiles with features (packed vector and/or EAV rows)
         query = """
             SELECT 
                 cp.id as profile_id,
@@ -106,12 +149,16 @@ def load_training_data(brand_id: Optional[str] = None) -> pd.DataFrame:
                 cp.lifetime_value,
                 cp.total_orders,
                 cp.profile_strength,
-                jsonb_object_agg(f.feature_name, f.feature_value) as features
+                fv.schema_version,
+                fv.vector,
+                jsonb_object_agg(f.feature_name, f.feature_value) FILTER (WHERE f.id IS NOT NULL) as features
             FROM customer_profile cp
+            LEFT JOIN profile_feature_vector fv ON cp.id = fv.profile_id
             LEFT JOIN features f ON cp.id = f.profile_id
             WHERE cp.brand_id = %s OR %s IS NULL
-            GROUP BY cp.id, cp.brand_id, cp.lifetime_value, cp.total_orders, cp.profile_strength
-            HAVING COUNT(f.id) > 0
+            GROUP BY cp.id, cp.brand_id, cp.lifetime_value, cp.total_orders, cp.profile_strength,
+                     fv.schema_version, fv.vector
+            HAVING COUNT(f.id) > 0 OR fv.schema_version IS NOT NULL
         """
         
         cursor.execute(query, [brand_id, brand_id])
@@ -124,6 +171,9 @@ def load_training_data(brand_id: Optional[str] = None) -> pd.DataFrame:
         data = []
         for row in rows:
             features = row['features'] or {}
+            if row['vector'] is not None:
+                # Stored vector wins over any legacy numeric EAV rows
+                features.update(unpack_features(bytes(row['vector']), row['schema_version']) or {})
             data.append({
                 'profile_id': row['profile_id'],
                 'brand_id': row['brand_id'],
@@ -154,7 +204,7 @@ def create_ltv_labels(df: pd.DataFrame) -> pd.Series:
     """Use actual lifetime_value as LTV label"""
     return df['lifetime_value']
 
-def train_segmentation_model(df: pd.DataFrame) -> Dict[str, Any]:
+def train_segmentation_model(df: pd.DataFrame, brand_id: Optional[str] = None) -> Dict[str, Any]:
     """Train KMeans clustering for customer segmentation with evaluation"""
     # Select features for clustering
     feature_cols = ['recency', 'frequency', 'monetary', 'profile_strength']
@@ -181,17 +231,8 @@ def train_segmentation_model(df: pd.DataFrame) -> Dict[str, Any]:
     segment_counts = pd.Series(segments).value_counts().to_dict()
     segment_names = ['champions', 'at_risk', 'new_customers', 'loyal']
     
-    model_version = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    
-    # Save model
-    model_file = os.path.join(MODEL_PATH, f"segmentation_{model_version}.pkl")
-    with open(model_file, 'wb') as f:
-        pickle.dump({
-            'model': kmeans,
-            'scaler': scaler,
-            'feature_cols': available_cols,
-            'version': model_version,
-        }, f)
+    model_version = new_model_version(brand_id)
+    hyperparameters = {'n_clusters': 4, 'random_state': 42, 'n_init': 10}
     
     # Prepare metrics
     metrics = {
@@ -202,6 +243,15 @@ def train_segmentation_model(df: pd.DataFrame) -> Dict[str, Any]:
         'n_samples': len(df)
     }
     
+    # Save model
+    model_file = save_model_artifact('segmentation', {
+        'model': kmeans,
+        'scaler': scaler,
+        'feature_cols': available_cols,
+        'version': model_version,
+        'brand_id': brand_id,
+    }, metrics, hyperparameters, len(df))
+    
     # Save to database
     save_model_version(
         model_type='segmentation',
@@ -210,8 +260,9 @@ def train_segmentation_model(df: pd.DataFrame) -> Dict[str, Any]:
         metrics=metrics,
         training_samples=len(df),
         feature_count=len(available_cols),
-        hyperparameters={'n_clusters': 4, 'random_state': 42, 'n_init': 10},
-        is_active=True
+        hyperparameters=hyperparameters,
+        is_active=True,
+        brand_id=brand_id
     )
     
     return {
@@ -221,7 +272,7 @@ def train_segmentation_model(df: pd.DataFrame) -> Dict[str, Any]:
         'metrics': metrics
     }
 
-def train_churn_model(df: pd.DataFrame) -> Dict[str, Any]:
+def train_churn_model(df: pd.DataFrame, brand_id: Optional[str] = None) -> Dict[str, Any]:
     """Train LightGBM model for churn prediction with evaluation"""
     # Create labels
     labels = create_churn_labels(df, datetime.utcnow())
@@ -282,15 +333,7 @@ def train_churn_model(df: pd.DataFrame) -> Dict[str, Any]:
     cm = confusion_matrix(y_test, y_pred)
     tn, fp, fn, tp = cm.ravel() if cm.size == 4 else (0, 0, 0, 0)
     
-    model_version = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    model_file = os.path.join(MODEL_PATH, f"churn_{model_version}.pkl")
-    
-    with open(model_file, 'wb') as f:
-        pickle.dump({
-            'model': model,
-            'feature_cols': X.columns.tolist(),
-            'version': model_version,
-        }, f)
+    model_version = new_model_version(brand_id)
     
     # Prepare metrics
     metrics = {
@@ -310,6 +353,14 @@ def train_churn_model(df: pd.DataFrame) -> Dict[str, Any]:
         'churn_rate': float(labels.mean())
     }
     
+    # Save model
+    model_file = save_model_artifact('churn', {
+        'model': model,
+        'feature_cols': X.columns.tolist(),
+        'version': model_version,
+        'brand_id': brand_id,
+    }, metrics, params, len(df))
+    
     # Save to database
     save_model_version(
         model_type='churn',
@@ -319,7 +370,8 @@ def train_churn_model(df: pd.DataFrame) -> Dict[str, Any]:
         training_samples=len(df),
         feature_count=len(X.columns),
         hyperparameters=params,
-        is_active=True
+        is_active=True,
+        brand_id=brand_id
     )
     
     print(f"📊 Churn Model Metrics:")
@@ -336,7 +388,7 @@ def train_churn_model(df: pd.DataFrame) -> Dict[str, Any]:
         'metrics': metrics
     }
 
-def train_ltv_model(df: pd.DataFrame) -> Dict[str, Any]:
+def train_ltv_model(df: pd.DataFrame, brand_id: Optional[str] = None) -> Dict[str, Any]:
     """Train LightGBM regression model for LTV prediction with evaluation"""
     labels = create_ltv_labels(df)
     
@@ -386,15 +438,7 @@ def train_ltv_model(df: pd.DataFrame) -> Dict[str, Any]:
     mean_ltv = float(y_test.mean())
     mape = np.mean(np.abs((y_test - y_pred) / (y_test + 1e-8))) * 100  # Avoid division by zero
     
-    model_version = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    model_file = os.path.join(MODEL_PATH, f"ltv_{model_version}.pkl")
-    
-    with open(model_file, 'wb') as f:
-        pickle.dump({
-            'model': model,
-            'feature_cols': X.columns.tolist(),
-            'version': model_version,
-        }, f)
+    model_version = new_model_version(brand_id)
     
     # Prepare metrics
     metrics = {
@@ -409,6 +453,14 @@ def train_ltv_model(df: pd.DataFrame) -> Dict[str, Any]:
         'actual_mean': float(y_test.mean())
     }
     
+    # Save model
+    model_file = save_model_artifact('ltv', {
+        'model': model,
+        'feature_cols': X.columns.tolist(),
+        'version': model_version,
+        'brand_id': brand_id,
+    }, metrics, params, len(df))
+    
     # Save to database
     save_model_version(
         model_type='ltv',
@@ -418,7 +470,8 @@ def train_ltv_model(df: pd.DataFrame) -> Dict[str, Any]:
         training_samples=len(df),
         feature_count=len(X.columns),
         hyperparameters=params,
-        is_active=True
+        is_active=True,
+        brand_id=brand_id
     )
     
     print(f"📊 LTV Model Metrics:")
@@ -437,7 +490,7 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser()
-    parser.add_argument("--brand-id")
+    parser.add_argument("--brand-id", help="Train models for this brand only (served to it instead of the shared models)")
     args = parser.parse_args()
     
     print("Loading training data...")
@@ -447,20 +500,20 @@ if __name__ == "__main__":
     print("\n" + "="*50)
     print("Training segmentation model...")
     print("="*50)
-    seg_result = train_segmentation_model(df)
+    seg_result = train_segmentation_model(df, args.brand_id)
     print(f"✅ Segmentation model saved: {seg_result['model_file']}")
     print(f"   Silhouette Score: {seg_result['metrics']['silhouette_score']:.4f}")
     
     print("\n" + "="*50)
     print("Training churn model...")
     print("="*50)
-    churn_result = train_churn_model(df)
+    churn_result = train_churn_model(df, args.brand_id)
     print(f"✅ Churn model saved: {churn_result['model_file']}")
     
     print("\n" + "="*50)
     print("Training LTV model...")
     print("="*50)
-    ltv_result = train_ltv_model(df)
+    ltv_result = train_ltv_model(df, args.brand_id)
     print(f"✅ LTV model saved: {ltv_result['model_file']}")
     
     print("\n" + "="*50)
@@ -1,6 +1,7 @@
 # GENERATOR: ML_PHASE1
 # ASSUMPTIONS: PostgreSQL database with customer_raw_event table, purchase events contain product data
 # HOW TO RUN: python train/train_recommendations.py --brand-id <brand_id>
+#             (large brands: add --streaming to train from an on-disk corpus on every core)
 # TODO: Add product metadata table for better recommendations
 
 import os
@@ -12,11 +13,12 @@ from psycopg2.extras import RealDictCursor
 import pandas as pd
 import json
 import pickle
+import time
 import numpy as np
 from datetime import datetime
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator
 from dotenv import load_dotenv
-from collections import defaultdict
+import tempfile
 import faiss
 
 # For item2vec (Word2Vec for items)
@@ -27,6 +29,16 @@ except ImportError:
     print("⚠️  Warning: gensim not installed. Install with: pip install gensim")
     GENSIM_AVAILABLE = False
 
+from api.ann_index import (
+    INDEX_TYPES, build_index, format_report, index_bytes, recall_report,
+    sample_queries, search_params, tune_search_params,
+)
+from api.purchase_items import (
+    HISTORY_EVENT_LIMIT, HISTORY_SQL, ML_PURCHASE_ITEM_TABLE, PAYLOAD_HISTORY_SQL,
+    PAYLOAD_SEQUENCES_SQL, SEQUENCES_SQL, purchased_product_ids,
+)
+from api.artifacts import ML_ARTIFACT_FORMAT, ML_EMBEDDING_DTYPE, ItemEmbeddings, save_recommendation_artifact
+
 load_dotenv()
 
 MODEL_PATH = os.getenv("ML_MODEL_PATH", "./models")
@@ -38,90 +50,88 @@ def get_db_connection():
         db_url = db_url.split("?")[0]
     return psycopg2.connect(db_url, cursor_factory=RealDictCursor)
 
-def extract_item_sequences(brand_id: Optional[str] = None) -> List[List[str]]:
+def group_sequences(rows: Iterable[Dict[str, Any]]) -> Iterator[List[str]]:
     """
-    Extract item sequences from purchase events
-    Returns list of sequences, where each sequence is a list of product_ids
+    Purchase sequences (product ids in time order) from rows sorted by profile
+    
+    rows: SEQUENCES_SQL rows (profile_id, product_id) or, with
+    ML_PURCHASE_ITEM_TABLE=false, PAYLOAD_SEQUENCES_SQL rows (profile_id, payload).
+    Only one profile's sequence is held at a time.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    current_profile = None
+    products: List[str] = []
+    for row in rows:
+        if row['profile_id'] != current_profile:
+            if products:
+                yield products
+            current_profile = row['profile_id']
+            products = []
+        if 'product_id' in row:
+            products.append(row['product_id'])
+        else:
+            products.extend(purchased_product_ids(row['payload']))
+    if products:
+        yield products
+
+def iter_item_sequences(brand_id: Optional[str] = None, itersize: int = 20000) -> Iterator[List[str]]:
+    """
+    Stream purchase sequences through a server-side cursor
     
+    Rows are fetched itersize at a time, so memory stays flat however many
+    purchase events the brand has.
+    """
+    conn = get_db_connection()
     try:
-        # Get all purchase events with product data
-        query = """
-            SELECT 
-                customer_profile_id,
-                payload,
-                created_at
-            FROM customer_raw_event
-            WHERE event_type = 'purchase'
-            AND (brand_id = %s OR %s IS NULL)
-            AND customer_profile_id IS NOT NULL
-            ORDER BY customer_profile_id, created_at
-        """
-        
-        cursor.execute(query, [brand_id, brand_id])
-        rows = cursor.fetchall()
-        
-        # Group by customer profile
-        customer_sequences = defaultdict(list)
-        
-        for row in rows:
-            profile_id = row['customer_profile_id']
-            payload = row['payload']
-            
-            if isinstance(payload, str):
-                payload = json.loads(payload)
-            
-            # Extract product IDs from various payload structures
-            product_ids = []
-            
-            # Structure 1: items array
-            if 'items' in payload:
-                for item in payload['items']:
-                    if isinstance(item, dict):
-                        product_id = item.get('product_id') or item.get('id') or item.get('sku')
-                        if product_id:
-                            product_ids.append(str(product_id))
-            
-            # Structure 2: line_items array
-            if 'line_items' in payload:
-                for item in payload['line_items']:
-                    if isinstance(item, dict):
-                        product_id = item.get('product_id') or item.get('id') or item.get('sku')
-                        if product_id:
-                            product_ids.append(str(product_id))
-            
-            # Structure 3: products array
-            if 'products' in payload:
-                for item in payload['products']:
-                    if isinstance(item, dict):
-                        product_id = item.get('product_id') or item.get('id') or item.get('sku')
-                        if product_id:
-                            product_ids.append(str(product_id))
-                    elif isinstance(item, str):
-                        product_ids.append(item)
-            
-            # Structure 4: single product_id
-            if 'product_id' in payload and not product_ids:
-                product_ids.append(str(payload['product_id']))
-            
-            if product_ids:
-                customer_sequences[profile_id].extend(product_ids)
-        
-        # Convert to sequences (each customer's purchase history)
-        sequences = []
-        for profile_id, products in customer_sequences.items():
-            if len(products) >= 2:  # Need at least 2 items for training
-                sequences.append(products)
-        
-        return sequences
-        
-    finally:
+        # Named cursor = server-side: rows stay in Postgres until iterated
+        cursor = conn.cursor(name='item_sequences')
+        cursor.itersize = itersize
+        # Product IDs per purchase, already extracted into purchase_item
+        # (or walked out of the raw payloads with ML_PURCHASE_ITEM_TABLE=false)
+        cursor.execute(SEQUENCES_SQL if ML_PURCHASE_ITEM_TABLE else PAYLOAD_SEQUENCES_SQL, [brand_id, brand_id])
+        yield from group_sequences(cursor)
         cursor.close()
+    finally:
         conn.close()
 
-def train_item2vec(sequences: List[List[str]], vector_size: int = 64, window: int = 5) -> Word2Vec:
+def extract_item_sequences(brand_id: Optional[str] = None) -> List[List[str]]:
+    """
+    Extract item sequences from purchase events
+    Returns list of sequences, where each sequence is a list of product_ids
+    """
+    # Need at least 2 items for training
+    return [products for products in iter_item_sequences(brand_id) if len(products) >= 2]
+
+def write_sequence_corpus(sequences: Iterable[List[str]], corpus_path: str) -> Dict[str, Any]:
+    """
+    Write sequences as a line-delimited corpus file for Word2Vec(corpus_file=...)
+    
+    Tokens are integer product codes, since product ids may contain
+    whitespace (the corpus separator). Sequences with fewer than 2 items are
+    skipped; only the code table is kept in memory.
+    Returns {sequences, words, products: [product_id by code]}.
+    """
+    codes: Dict[str, int] = {}
+    products: List[str] = []
+    sequences_written = 0
+    words = 0
+    with open(corpus_path, 'w') as f:
+        for sequence in sequences:
+            if len(sequence) < 2:
+                continue
+            tokens = []
+            for product_id in sequence:
+                code = codes.get(product_id)
+                if code is None:
+                    code = codes[product_id] = len(products)
+                    products.append(product_id)
+                tokens.append(str(code))
+            f.write(' '.join(tokens))
+            f.write('\n')
+            sequences_written += 1
+            words += len(tokens)
+    return {'sequences': sequences_written, 'words': words, 'products': products}
+
+def train_item2vec(sequences: List[List[str]], vector_size: int = 64, window: int = 5, workers: int = 4) -> Word2Vec:
     """
     Train item2vec model (Word2Vec for products)
     """
@@ -135,38 +145,121 @@ def train_item2vec(sequences: List[List[str]], vector_size: int = 64, window: in
     
     model = Word2Vec(
         sentences=sequences,
-        vector_size=vector_size,
-        window=window,
-        min_count=2,  # Product must appear at least 2 times
-        workers=4,
-        sg=1,  # Skip-gram (better for small datasets)
-        epochs=10
+        **item2vec_params(vector_size, window, workers)
     )
     
     return model
 
-def build_faiss_index(item2vec_model: Word2Vec, dimension: int = 64) -> Tuple[faiss.Index, Dict[str, int]]:
+def train_item2vec_corpus_file(
+    corpus_path: str,
+    corpus: Dict[str, Any],
+    vector_size: int = 64,
+    window: int = 5,
+    workers: Optional[int] = None
+) -> Word2Vec:
     """
-    Build FAISS index for fast similarity search
-    Returns: FAISS index and product_id to index mapping
+    Train item2vec from a corpus file written by write_sequence_corpus
+    
+    gensim's corpus_file mode gives every worker its own byte range of the
+    file and reads it in C without the GIL, so throughput grows with
+    workers (default: every core). Vocabulary keys are mapped back from
+    corpus codes to product ids. gensim splits lines longer than 10000 tokens.
     """
-    # Get all product vectors
+    if not GENSIM_AVAILABLE:
+        raise ImportError("gensim is required for item2vec. Install with: pip install gensim")
+    
+    if corpus['sequences'] < 10:
+        raise ValueError(f"Need at least 10 customer sequences, got {corpus['sequences']}")
+    
+    workers = workers or os.cpu_count() or 1
+    print(f"Training item2vec on {corpus['sequences']} customer sequences from {corpus_path} ({workers} workers)...")
+    
+    model = Word2Vec(
+        corpus_file=corpus_path,
+        **item2vec_params(vector_size, window, workers)
+    )
+    
+    products = corpus['products']
+    model.wv.index_to_key = [products[int(code)] for code in model.wv.index_to_key]
+    model.wv.key_to_index = {product_id: idx for idx, product_id in enumerate(model.wv.index_to_key)}
+    return model
+
+def item2vec_params(vector_size: int, window: int, workers: int) -> Dict[str, Any]:
+    """Word2Vec settings shared by the in-memory and corpus-file paths"""
+    return {
+        'vector_size': vector_size,
+        'window': window,
+        'min_count': 2,  # Product must appear at least 2 times
+        'workers': workers,
+        'sg': 1,  # Skip-gram (better for small datasets)
+        'epochs': 10,
+    }
+
+def item_vectors(item2vec_model: Word2Vec) -> Tuple[List[str], np.ndarray]:
+    """Product ids and their L2-normalized embeddings, in index order"""
     product_ids = list(item2vec_model.wv.index_to_key)
     vectors = np.array([item2vec_model.wv[pid] for pid in product_ids], dtype='float32')
     
     # Normalize vectors for cosine similarity
     faiss.normalize_L2(vectors)
+    return product_ids, vectors
+
+def build_faiss_index(
+    item2vec_model: Word2Vec,
+    dimension: int = 64,
+    index_type: str = 'flat',
+    target_recall: float = 0.95,
+    top_k: int = 10,
+    compare: bool = False,
+    **index_options
+) -> Tuple[faiss.Index, Dict[str, int], Dict[str, Any]]:
+    """
+    Build FAISS index for fast similarity search
     
-    # Build FAISS index (L2 distance for normalized vectors = cosine similarity)
-    index = faiss.IndexFlatIP(dimension)  # Inner product for normalized vectors = cosine similarity
-    index.add(vectors)
+    index_type: flat (exact), ivf_flat, ivf_pq or hnsw (see api/ann_index.py);
+    index_options: nlist, pq_m, hnsw_m, ef_construction.
+    Approximate indexes are measured against exact search (recall@top_k and
+    latency per nprobe/efSearch) and set to the fastest setting reaching
+    target_recall. compare=True also builds and measures every other index
+    type, for choosing one per brand.
+    Returns: FAISS index, product_id to index mapping and the recall report
+    """
+    product_ids, vectors = item_vectors(item2vec_model)
+    if vectors.shape[1] != dimension:
+        raise ValueError(f"Embeddings have {vectors.shape[1]} dimensions, expected {dimension}")
+    
+    queries = sample_queries(vectors)
+    report = []
+    index = None
+    for candidate in (INDEX_TYPES if compare else (index_type,)):
+        started = time.perf_counter()
+        candidate_index = build_index(vectors, candidate, **index_options)
+        build_seconds = time.perf_counter() - started
+        rows = recall_report(candidate_index, vectors, k=top_k, queries=queries)
+        chosen = tune_search_params(candidate_index, rows, target_recall)
+        for row in rows:
+            row.update({
+                'build_seconds': round(build_seconds, 2),
+                'index_bytes': index_bytes(candidate_index),
+                'chosen': row is chosen,
+            })
+        report.extend(rows)
+        if candidate == index_type:
+            index = candidate_index
+    
+    print(format_report(report))
     
     # Create mapping: product_id -> index position
     product_to_idx = {pid: idx for idx, pid in enumerate(product_ids)}
     
-    print(f"✅ Built FAISS index with {len(product_ids)} products")
+    ann_index = {
+        **search_params(index),
+        'target_recall': target_recall,
+        'report': report,
+    }
+    print(f"✅ Built FAISS index with {len(product_ids)} products: {search_params(index)}")
     
-    return index, product_to_idx
+    return index, product_to_idx, ann_index
 
 def get_customer_item_history(profile_id: str, brand_id: Optional[str] = None) -> List[str]:
     """
@@ -176,41 +269,15 @@ def get_customer_item_history(profile_id: str, brand_id: Optional[str] = None) -
     cursor = conn.cursor()
     
     try:
-        query = """
-            SELECT payload
-            FROM customer_raw_event
-            WHERE event_type = 'purchase'
-            AND customer_profile_id = %s
-            AND (brand_id = %s OR %s IS NULL)
-            ORDER BY created_at DESC
-            LIMIT 100
-        """
-        
-        cursor.execute(query, [profile_id, brand_id, brand_id])
-        rows = cursor.fetchall()
+        params = [profile_id, brand_id, brand_id, HISTORY_EVENT_LIMIT]
+        if ML_PURCHASE_ITEM_TABLE:
+            cursor.execute(HISTORY_SQL, params)
+            product_ids = [row['product_id'] for row in cursor.fetchall()]
+        else:
+            cursor.execute(PAYLOAD_HISTORY_SQL, params)
+            product_ids = [pid for row in cursor.fetchall() for pid in purchased_product_ids(row['payload'])]
         
-        product_ids = []
-        for row in rows:
-            payload = row['payload']
-            if isinstance(payload, str):
-                payload = json.loads(payload)
-            
-            # Extract product IDs (same logic as extract_item_sequences)
-            if 'items' in payload:
-                for item in payload['items']:
-                    if isinstance(item, dict):
-                        pid = item.get('product_id') or item.get('id') or item.get('sku')
-                        if pid:
-                            product_ids.append(str(pid))
-            
-            if 'line_items' in payload:
-                for item in payload['line_items']:
-                    if isinstance(item, dict):
-                        pid = item.get('product_id') or item.get('id') or item.get('sku')
-                        if pid:
-                            product_ids.append(str(pid))
-        
-        return list(set(product_ids))  # Remove duplicates
+        return list(dict.fromkeys(product_ids))  # Remove duplicates
         
     finally:
         cursor.close()
@@ -220,19 +287,45 @@ def save_recommendation_model(
     item2vec_model: Word2Vec,
     faiss_index: faiss.Index,
     product_to_idx: Dict[str, int],
-    vector_size: int
+    vector_size: int,
+    ann_index: Optional[Dict[str, Any]] = None
 ):
-    """Save recommendation model components"""
+    """Save recommendation model components (ann_index: index parameters and recall report)"""
     model_version = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     
-    # Save item2vec model
+    # Serving export: vectors in FAISS order, products by purchase count.
+    # The service memory-maps these and never imports gensim.
+    embeddings = ItemEmbeddings.from_keyed_vectors(item2vec_model.wv, ML_EMBEDDING_DTYPE)
+    if embeddings.key_to_index != product_to_idx:
+        raise ValueError("item2vec vocabulary order does not match the FAISS index")
+    
+    if ML_ARTIFACT_FORMAT == 'manifest':
+        # One checksummed directory: FAISS index, product order, vectors, popularity
+        metadata_path = save_recommendation_artifact(
+            os.path.join(MODEL_PATH, f"recommendations_{model_version}"),
+            model_version, embeddings, faiss_index, vector_size,
+            training={'ann_index': ann_index} if ann_index else None
+        )
+        print(f"✅ Saved recommendation model: {metadata_path}")
+        return {
+            'metadata_path': metadata_path,
+            'version': model_version,
+        }
+    
+    # Save item2vec model; every array goes to its own .npy file so the
+    # service can memory-map them (Word2Vec.load(..., mmap='r'))
     item2vec_path = os.path.join(MODEL_PATH, f"item2vec_{model_version}.model")
-    item2vec_model.save(item2vec_path)
+    item2vec_model.save(item2vec_path, sep_limit=0)
     
     # Save FAISS index
     faiss_path = os.path.join(MODEL_PATH, f"faiss_index_{model_version}.index")
     faiss.write_index(faiss_index, faiss_path)
     
+    # Save serving export
+    vectors_path = os.path.join(MODEL_PATH, f"item_vectors_{model_version}.npy")
+    popularity_path = os.path.join(MODEL_PATH, f"item_popularity_{model_version}.npy")
+    embeddings.save(vectors_path, popularity_path)
+    
     # Save metadata
     metadata_path = os.path.join(MODEL_PATH, f"recommendations_metadata_{model_version}.pkl")
     with open(metadata_path, 'wb') as f:
@@ -241,18 +334,23 @@ def save_recommendation_model(
             'vector_size': vector_size,
             'item2vec_path': item2vec_path,
             'faiss_path': faiss_path,
+            'vectors_path': vectors_path,
+            'popularity_path': popularity_path,
             'version': model_version,
             'num_products': len(product_to_idx),
+            'ann_index': ann_index,
         }, f)
     
     print(f"✅ Saved recommendation model:")
     print(f"   Item2Vec: {item2vec_path}")
     print(f"   FAISS Index: {faiss_path}")
+    print(f"   Vectors: {vectors_path}")
     print(f"   Metadata: {metadata_path}")
     
     return {
         'item2vec_path': item2vec_path,
         'faiss_path': faiss_path,
+        'vectors_path': vectors_path,
         'metadata_path': metadata_path,
         'version': model_version,
     }
@@ -264,6 +362,22 @@ if __name__ == "__main__":
     parser.add_argument("--brand-id")
     parser.add_argument("--vector-size", type=int, default=64)
     parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=os.getenv("ML_FAISS_INDEX_TYPE", "flat"),
+                        help="FAISS index to build (flat = exact search)")
+    parser.add_argument("--nlist", type=int, help="IVF lists (default ~4*sqrt(products))")
+    parser.add_argument("--pq-m", type=int, help="IVF-PQ bytes per vector (must divide --vector-size)")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW neighbours per node")
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--target-recall", type=float, default=0.95,
+                        help="Pick the fastest nprobe/efSearch reaching this recall@top-k")
+    parser.add_argument("--top-k", type=int, default=10, help="k of the recall@k report")
+    parser.add_argument("--compare-indexes", action="store_true",
+                        help="Also build and report every other index type")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Stream sequences to a corpus file and train from it (large brands)")
+    parser.add_argument("--corpus-file", help="Corpus path in --streaming mode (kept; default: temporary file)")
+    parser.add_argument("--workers", type=int,
+                        help="item2vec worker threads (default: 4, or every core with --streaming)")
     args = parser.parse_args()
     
     if not GENSIM_AVAILABLE:
@@ -274,32 +388,72 @@ if __name__ == "__main__":
     print("Training Recommendation Engine (item2vec + FAISS)")
     print("=" * 50)
     
-    # Extract item sequences
-    print("\n1. Extracting item sequences from purchase events...")
-    sequences = extract_item_sequences(args.brand_id)
-    print(f"   Found {len(sequences)} customer sequences")
-    
-    if len(sequences) < 10:
-        print(f"❌ Error: Need at least 10 customer sequences, got {len(sequences)}")
-        print("   Generate more test data or wait for real purchase events")
-        sys.exit(1)
-    
-    total_items = sum(len(seq) for seq in sequences)
-    unique_products = len(set(item for seq in sequences for item in seq))
-    print(f"   Total items: {total_items}, Unique products: {unique_products}")
-    
-    # Train item2vec
-    print("\n2. Training item2vec model...")
-    item2vec_model = train_item2vec(sequences, vector_size=args.vector_size, window=args.window)
+    if args.streaming:
+        # Sequences go straight from a server-side cursor to disk
+        print("\n1. Streaming item sequences from purchase events to a corpus file...")
+        corpus_path = args.corpus_file
+        if not corpus_path:
+            fd, corpus_path = tempfile.mkstemp(prefix="item2vec_", suffix=".txt")
+            os.close(fd)
+        corpus = write_sequence_corpus(iter_item_sequences(args.brand_id), corpus_path)
+        print(f"   Wrote {corpus['sequences']} customer sequences to {corpus_path}")
+        
+        if corpus['sequences'] < 10:
+            print(f"❌ Error: Need at least 10 customer sequences, got {corpus['sequences']}")
+            print("   Generate more test data or wait for real purchase events")
+            sys.exit(1)
+        
+        print(f"   Total items: {corpus['words']}, Unique products: {len(corpus['products'])}")
+        
+        # Train item2vec
+        print("\n2. Training item2vec model...")
+        try:
+            item2vec_model = train_item2vec_corpus_file(
+                corpus_path, corpus, vector_size=args.vector_size, window=args.window, workers=args.workers
+            )
+        finally:
+            if not args.corpus_file:
+                os.remove(corpus_path)
+    else:
+        # Extract item sequences
+        print("\n1. Extracting item sequences from purchase events...")
+        sequences = extract_item_sequences(args.brand_id)
+        print(f"   Found {len(sequences)} customer sequences")
+        
+        if len(sequences) < 10:
+            print(f"❌ Error: Need at least 10 customer sequences, got {len(sequences)}")
+            print("   Generate more test data or wait for real purchase events")
+            sys.exit(1)
+        
+        total_items = sum(len(seq) for seq in sequences)
+        unique_products = len(set(item for seq in sequences for item in seq))
+        print(f"   Total items: {total_items}, Unique products: {unique_products}")
+        
+        # Train item2vec
+        print("\n2. Training item2vec model...")
+        item2vec_model = train_item2vec(
+            sequences, vector_size=args.vector_size, window=args.window, workers=args.workers or 4
+        )
     print(f"   Vocabulary size: {len(item2vec_model.wv)}")
     
     # Build FAISS index
     print("\n3. Building FAISS index...")
-    faiss_index, product_to_idx = build_faiss_index(item2vec_model, dimension=args.vector_size)
+    faiss_index, product_to_idx, ann_index = build_faiss_index(
+        item2vec_model,
+        dimension=args.vector_size,
+        index_type=args.index_type,
+        target_recall=args.target_recall,
+        top_k=args.top_k,
+        compare=args.compare_indexes,
+        nlist=args.nlist,
+        pq_m=args.pq_m,
+        hnsw_m=args.hnsw_m,
+        ef_construction=args.ef_construction,
+    )
     
     # Save models
     print("\n4. Saving models...")
-    result = save_recommendation_model(item2vec_model, faiss_index, product_to_idx, args.vector_size)
+    result = save_recommendation_model(item2vec_model, faiss_index, product_to_idx, args.vector_size, ann_index)
     
     print("\n" + "=" * 50)
     print("✅ Recommendation engine training complete!")